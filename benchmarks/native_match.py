@@ -0,0 +1,82 @@
+"""
+compare compiled tables with `native=True` tables, python 3.10+
+
+    python benchmarks/native_match.py
+"""
+import timeit
+
+from dataclasses import dataclass
+
+from xpattern import HEAD
+from xpattern import TAIL
+from xpattern import _
+from xpattern import caseof
+from xpattern import m
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+
+@dataclass
+class Line:
+    a: object
+    b: object
+
+
+TYPES = [type("Type%d" % i, (), {}) for i in range(30)]
+
+WORKLOADS = {
+    "60 int literals": (
+        [m(i) >> i for i in range(60)] + [_ >> None],
+        list(range(70)),
+    ),
+    "30 type arms": (
+        [m(cls) >> i for i, cls in enumerate(TYPES)] + [_ >> None],
+        [cls() for cls in TYPES],
+    ),
+    "20 sequence arms": (
+        [m(*[int] * n) >> n for n in range(1, 20)] + [m(HEAD, TAIL) >> -1, _ >> None],
+        [list(range(n)) for n in range(1, 25)],
+    ),
+    "class patterns": (
+        [m.cls(Point, x=i, y=_) >> (lambda y: y) for i in range(10)]
+        + [
+            m.cls(Line, a=m.cls(Point, 0, _), b=_) >> (lambda y, b: b),
+            _ >> None,
+        ],
+        [Point(i, i) for i in range(12)] + [Line(Point(0, 1), 2), Line(1, 2)],
+    ),
+    "dict patterns": (
+        [
+            m({"type": "t%d" % i, "id": int, "data": _}) >> (lambda id, data: data)
+            for i in range(15)
+        ]
+        + [_ >> None],
+        [{"type": "t%d" % i, "id": i, "data": i} for i in range(17)],
+    ),
+}
+
+
+def main(dispatches=100000, repeat=9):
+    for name, (cases, values) in WORKLOADS.items():
+        compiled = caseof.compile(*cases)
+        native = caseof.compile(*cases, native=True)
+        assert [compiled(v) for v in values] == [native(v) for v in values], name
+
+        number = dispatches // len(values)
+        timings = [
+            min(
+                timeit.repeat(
+                    lambda: [table(v) for v in values], number=number, repeat=repeat
+                )
+            )
+            for table in (compiled, native)
+        ]
+        print("{0:<20} compiled {1:.3f}s  native {2:.3f}s".format(name, *timings))
+
+
+if __name__ == "__main__":
+    main()
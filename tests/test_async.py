@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from xpattern import MatchError
+from xpattern import X
+from xpattern import _
+from xpattern import acaseof
+from xpattern import caseof
+from xpattern import m
+from xpattern import xfunction
+
+
+async def is_admin(user):
+    await asyncio.sleep(0)
+    return user == "root"
+
+
+async def greet(user):
+    await asyncio.sleep(0)
+    return "hello " + user
+
+
+@xfunction
+async def known(key):
+    await asyncio.sleep(0)
+    return key in ("a", "b")
+
+
+@xfunction
+async def lookup(key):
+    await asyncio.sleep(0)
+    return {"a": 1}.get(key)
+
+
+# fmt: off
+def test_acaseof():
+    async def main():
+        assert await (acaseof("root")
+            | m(is_admin) >> "admin"
+            | m(str) >> greet
+        ) == "admin"
+        assert await (~(acaseof("bob")
+            | m(is_admin) >> "admin"
+            | m(str) >> greet
+        )) == "hello bob"
+        assert await (acaseof(1) | m(1) >> X + 1) == 2
+
+        with pytest.raises(MatchError):
+            await (acaseof(2) | m(1) >> "one")
+
+    asyncio.run(main())
+
+
+def test_dispatch_async():
+    table = caseof.compile(
+        m(int) >> (lambda x: x * 2),
+        m(known(X)) >> lookup(X),
+        m(known(X[0])) >> "known first",
+        _ >> greet,
+    )
+
+    async def main():
+        assert await table.dispatch_async("a") == 1
+        assert await table.dispatch_async("b") is None
+        assert await table.dispatch_async("b", "c") == "known first"
+        assert await table.dispatch_async(3) == 6
+        assert await table.dispatch_async("c") == "hello c"
+        assert await (~(acaseof(X) | m(is_admin) >> "admin" | _ >> "user"))("x") == "user"
+
+    asyncio.run(main())
+
+
+def test_amap():
+    running = []
+    peak = []
+
+    async def slow(value):
+        running.append(value)
+        peak.append(len(running))
+        await asyncio.sleep(0.001 * (value % 3))
+        running.remove(value)
+        return value * 10
+
+    async def values():
+        for value in range(20):
+            yield value
+
+    table = caseof.compile(m(int) >> slow, _ >> "other")
+
+    async def main():
+        assert await table.amap(values(), concurrency=4) == [v * 10 for v in range(20)]
+        assert max(peak) <= 4
+        assert await table.amap(["a", 1]) == ["other", 10]
+
+        with pytest.raises(MatchError):
+            await caseof.compile(m(1) >> 1).amap([1, 2, 1])
+
+    asyncio.run(main())
+
+
+def test_astream():
+    async def events():
+        for event in ["login", "click", "logout", "click"]:
+            await asyncio.sleep(0)
+            yield event
+
+    table = caseof.compile(
+        m("login") >> greet,
+        m("logout") >> "bye",
+    )
+
+    async def main():
+        return [
+            result
+            async for result in table.astream(events(), skip_unmatched=True, with_index=True)
+        ]
+
+    assert asyncio.run(main()) == [(0, "hello login"), (1, "bye")]
@@ -245,3 +245,149 @@ def test_matcher_with_bitwise_operators():
     assert not (~(m[1] | m[2])).pattern(2)
     assert (~m[X == 1]).pattern(2)
     assert (~m[lambda x: x == 1]).pattern(2)
+
+
+def test_bitwise_operators_are_flattened():
+    allowlist = m[1] | m[2] | m["3"] | m[int] | m[float] | m[X == "x"] | m[None]
+    assert allowlist.pattern.patterns == (1, 2, "3", int, float, allowlist.pattern.patterns[5], None)
+    assert [allowlist.pattern(v) for v in (1, "3", 7, 1.5, "x", None, "y", [1])] == [
+        True, True, True, True, True, True, False, False
+    ]
+    assert not (m[1] | m[2]).pattern(True)
+    assert not (m[1] | m[2]).pattern(1.0)
+    nan = float("nan")
+    assert not (m[nan] | m[1]).pattern(nan)
+
+    both = m[X > 1] & m[X < 10] & ~m[5]
+    assert len(both.pattern.patterns) == 3
+    assert [both.pattern(v) for v in (0, 4, 5, 11)] == [False, True, False, False]
+
+
+def test_oneof():
+    allowlist = m.oneof(*range(1000), "a", [1, 2])
+    assert [allowlist.pattern(v) for v in (999, 1.0, True, "a", [1, 2], [1], "b", 1000)] == [
+        True, True, True, True, True, False, False, False
+    ]
+    assert repr(m.oneof(1, "a").pattern) == "oneof(1, 'a')"
+
+    table = caseof.compile(
+        m.oneof("GET", "HEAD") >> "read",
+        m.oneof("POST", "PUT") >> (lambda method: method.lower()),
+        _ >> "other",
+    )
+    assert [table(v) for v in ("GET", "PUT", "DELETE", {})] == ["read", "put", "other", "other"]
+
+
+def test_bytes_pattern():
+    from xpattern import I16
+    from xpattern import REST
+    from xpattern import Field
+    from xpattern import U8
+    from xpattern import U16
+    from xpattern import U32
+
+    frames = caseof.compile(
+        m.bytes(b"\x01", U16, REST) >> (lambda length, body: ("data", length, bytes(body))),
+        m.bytes(b"\x02", U8, U32) >> (lambda flags, seq: ("ack", flags, seq)),
+        m.bytes(b"\x03", I16, byteorder="<") >> (lambda delta: ("delta", delta)),
+        _ >> "unknown",
+    )
+
+    assert frames(b"\x01\x00\x02hi") == ("data", 2, b"hi")
+    assert frames(bytearray(b"\x01\x00\x00")) == ("data", 0, b"")
+    assert frames(memoryview(b"\x02\x07\x00\x00\x01\x00")) == ("ack", 7, 256)
+    assert frames(b"\x03\xfe\xff") == ("delta", -2)
+    assert [frames(v) for v in (b"\x02\x07\x00", b"\x02\x07\x00\x00\x01\x00\x00", b"\x04", "\x01", None)] == ["unknown"] * 5
+
+    interpreted = ~(caseof(b"\x01\x00\x05rest")
+        | m.bytes(b"\x01", U16, REST) >> (lambda length, body: (length, bytes(body)))
+    )
+    assert interpreted == (5, b"rest")
+
+    body = frames.cases[0].pattern.matcher(b"\x01\x00\x01xyz")[1][1]
+    assert isinstance(body, memoryview) and body.tobytes() == b"xyz"
+    assert repr(m.bytes(b"\x01", U16, REST).pattern) == "bytes(b'\\x01', U16, TAIL)"
+
+    with pytest.raises(TypeError):
+        m.bytes(b"\x01", 3)
+    with pytest.raises(TypeError):
+        m.bytes(REST, U8)
+    for format in ("2H", "x", ">H", "<I", "", "Z", b"H"):
+        with pytest.raises(ValueError):
+            Field(format)
+    assert frames(b"\x02\x07\x00\x00\x01\x00") == caseof.compile(m.bytes(b"\x02", Field("B"), Field("I")) >> (lambda flags, seq: ("ack", flags, seq)))(b"\x02\x07\x00\x00\x01\x00")
+
+
+def test_regex_pattern():
+    routes = caseof.compile(
+        m.regex(r"^/users/(?P<user_id>\d+)$") >> (lambda user_id: ("user", int(user_id))),
+        m.regex(r"^/posts/(\d+)/comments/(?P<comment_id>\d+)") >> (lambda post, comment_id: (post, comment_id)),
+        m.regex(r"^/static/") >> (lambda path: path),
+        m.regex(rb"^\x01(..)") >> (lambda body: body),
+        _ >> "not found",
+    )
+
+    assert routes("/users/42") == ("user", 42)
+    assert routes("/posts/1/comments/2") == ("1", "2")
+    assert routes("/static/app.js") == "/static/app.js"
+    assert routes(b"\x01ab") == b"ab"
+    assert [routes(v) for v in ("/users/x", "/user/1", b"/users/1", 1, None)] == ["not found"] * 5
+
+    assert ~(caseof("/users/7")
+        | m.regex(r"^/users/(?P<user_id>\d+)") >> X
+    ) == {"user_id": "7"}
+    assert m.regex("^a+").pattern.regex is m.regex("^a+").pattern.regex
+
+    # bytes regexes search any bytes-like value
+    table = caseof.compile(m.regex(rb"^a(.)") >> (lambda b: bytes(b)), _ >> None)
+    assert [table(v) for v in (b"ab", bytearray(b"ac"), memoryview(b"ad"))] == [b"b", b"c", b"d"]
+    assert [table(v) for v in ("ab", bytearray(b"ba"))] == [None, None]
+
+
+def test_regex_keywords_are_decided_per_arm():
+    from xpattern._patterns import Keywords
+    from xpattern._patterns import produces_keywords
+
+    cases = (
+        m({"path": m.regex(r"^/users/(?P<user_id>\d+)").pattern, "method": _}) >> (lambda method, user_id: (method, user_id)),
+        m.cls(complex, real=m.regex("(?P<x>.)").pattern) >> "never",
+        m(_) >> (lambda value: value),
+    )
+    assert [produces_keywords(case.pattern) for case in cases] == [True, True, False]
+    assert not produces_keywords(m.regex("^a(b)").pattern)
+
+    table = caseof.compile(*cases)
+    request = {"path": "/users/3", "method": "GET"}
+    assert table(request) == ("GET", "3")
+    assert ~(caseof(request) | cases[0] | cases[2]) == ("GET", "3")
+
+    # values extracted by other patterns are passed as they are
+    keywords = Keywords(a=1)
+    assert table([keywords]) == [keywords]
+
+
+def test_regex_literal_prefix():
+    from xpattern._compiler import literal_prefix
+
+    assert literal_prefix(re.compile(r"^/users/\d+")) == "/users/"
+    assert literal_prefix(re.compile(r"\Aabc*")) == "ab"
+    assert literal_prefix(re.compile(r"^ab+")) == "ab"
+    assert literal_prefix(re.compile(r"^ab?")) == "a"
+    assert literal_prefix(re.compile(r"/users")) is None
+    assert literal_prefix(re.compile(r"^a|b")) is None
+    assert literal_prefix(re.compile(r"^abc", re.I)) is None
+    assert literal_prefix(re.compile(r"(?m)^abc")) is None
+
+
+def test_caseof_runs_compiled_matchers():
+    import pickle
+
+    cases = caseof(X) | m([X > 0, _]) >> "pos" | _ >> "other"
+    table = ~cases
+    for value in ([0, 1], [1, 1], [1], 0):
+        assert ~(caseof(value) | cases.cases[0] | cases.cases[1]) == table(value)
+
+    # the matcher compiled by a one-shot match is not pickled
+    restored = pickle.loads(pickle.dumps(cases.cases[0]))
+    assert restored._matcher is None
+    assert ~(caseof([2, 0]) | restored) == "pos"
@@ -0,0 +1,108 @@
+import re
+
+from dataclasses import dataclass
+from enum import Enum
+
+import pytest
+
+from xpattern import HEAD
+from xpattern import TAIL
+from xpattern import MatchError
+from xpattern import X
+from xpattern import _
+from xpattern._compiler import compile_pattern
+from xpattern._xpattern import match_value
+
+
+class Color(Enum):
+    RED = 1
+    GREEN = 2
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+
+@dataclass
+class Point2:
+    x: int
+    y: int
+
+
+# fmt: off
+@pytest.mark.parametrize(
+    "pattern, value",
+    [
+        (3, 3),
+        (3, 3.0),
+        (3, True),
+        ("a", "a"),
+        ("a", "b"),
+        (Color.RED, Color.RED),
+        (Color.RED, 1),
+        (None, None),
+        (None, 0),
+        (_, [1, 2]),
+        (int, 1),
+        (int, "1"),
+        ([1, _, 3], [1, 2, 3]),
+        ([1, _, 3], (1, 2, 3)),
+        ([1, _, 3], [1, 2, 3, 4]),
+        ([1, _], [1]),
+        ([HEAD, TAIL], [1, 2, 3]),
+        ([HEAD, TAIL], []),
+        ([HEAD, TAIL], (1,)),
+        ([1, TAIL], (1, 2, 3)),
+        ([TAIL], []),
+        (["a", "b"], "ab"),
+        ([int, [int, str], int], [1, [1, "a"], 2]),
+        ([int, [int, str], int], [1, [1, "a", "b"], 2]),
+        ([1, 2], 12),
+        ({"a": _}, {"a": 1, "b": 2}),
+        ({_: {"age": int}}, {"type": "dog", "info": {"age": 2}}),
+        ({"type": _, _: str}, {"type": "dog", "name": "fuffy"}),
+        ({_: int, "a": 1}, {"a": 1}),
+        ({"a": 1}, [("a", 1)]),
+        (Point(1, _), Point(1, 2)),
+        (Point(1, _), Point(2, 2)),
+        (Point(1, _), Point2(1, 2)),
+        (Point, Point(1, 2)),
+        (lambda x: x > 1, 2),
+        (lambda x: x > 1, 1),
+        (lambda x: (True, [x, x]), 1),
+        (X > 1, 2),
+        (X > 1, 1),
+        (re.compile(r"(\w+)-(\w+)"), "a-b"),
+        (re.compile(r"(\w+)-(\w+)"), "ab"),
+    ],
+)
+def test_compiled_equals_interpreted(pattern, value):
+    matched, extracted = match_value(pattern, value)
+    assert compile_pattern(pattern)(value) == (matched, extracted if matched else [])
+
+
+@pytest.mark.parametrize(
+    "pattern, value",
+    [
+        (HEAD, 1),
+        (TAIL, 1),
+        ([1, HEAD], [1, 2]),
+        ([TAIL, 1], [1, 2]),
+        (X + 1, 1),
+        (lambda x: x, 1),
+    ],
+)
+def test_compiled_raises(pattern, value):
+    with pytest.raises(MatchError):
+        compile_pattern(pattern)(value)
+
+
+def test_misplaced_head_is_lazy():
+    assert compile_pattern([1, HEAD])([2, 3]) == (False, [])
+
+
+def test_xobject_in_iterable():
+    assert compile_pattern([X > 1, _])([2, 3]) == (True, [3])
+    assert compile_pattern({"a": X > 1})({"a": 2}) == (True, [])
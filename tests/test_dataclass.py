@@ -1,3 +1,7 @@
+import sys
+
+import pytest
+
 from xpattern import X
 from xpattern import _
 from xpattern import caseof
@@ -149,3 +153,168 @@ def test_multi_dataclasses_with_getitem_style():
         | m[Rect(Point(_, int), Point2(_, 4))] >> "second"
         | m[Rect(Point(_, int), Point(_, 4))] >> (lambda x, y, z: (x, y, z))
     ) == (1, 2, 3)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 10), reason="dataclass slots need python 3.10")
+def test_slotted_dataclasses():
+    from dataclasses import dataclass
+
+    @dataclass(slots=True)
+    class Point:
+        x: int
+        y: int
+
+    @dataclass(slots=True)
+    class Line:
+        p1: Point
+        p2: Point
+
+    table = caseof.compile(
+        m(Line(Point(0, 0), _)) >> (lambda p2: ("from origin", p2.x)),
+        m(Line(Point(_, int), Point(_, 0))) >> (lambda x1, y1, x2: x1 + y1 + x2),
+    )
+    assert table(Line(Point(0, 0), Point(3, 4))) == ("from origin", 3)
+    assert table(Line(Point(1, 2), Point(3, 0))) == 6
+    assert ~(caseof(Line(Point(1, 2), Point(3, 0)))
+        | m(Line(Point(_, int), Point(_, 0))) >> (lambda x1, y1, x2: x1 + y1 + x2)
+    ) == 6
+
+
+def test_dataclass_extra_attributes_are_ignored():
+    from dataclasses import dataclass
+
+    @dataclass
+    class Order:
+        qty: int
+        price: float
+
+        def __post_init__(self):
+            self.token = object()
+
+    assert ~(caseof(Order(2, 1.5))
+        | m(Order(_, 3.0)) >> "never"
+        | m(Order(2, _)) >> (lambda price: price)
+    ) == 1.5
+    assert caseof.compile(m(Order(2, _)) >> (lambda price: price))(Order(2, 1.5)) == 1.5
+
+
+def test_attrs_classes():
+    attr = pytest.importorskip("attr")
+
+    @attr.s(slots=True)
+    class Point:
+        x = attr.ib()
+        y = attr.ib()
+
+    table = caseof.compile(m(Point(0, _)) >> (lambda y: y), m(Point(_, _)) >> (lambda x, y: x + y))
+    assert table(Point(0, 5)) == 5
+    assert table(Point(1, 5)) == 6
+    assert ~(caseof(Point(0, 7)) | m(Point(0, _)) >> (lambda y: y)) == 7
+
+
+def test_class_patterns():
+    from dataclasses import dataclass
+
+    class Vector:
+        __match_args__ = ("x", "y")
+
+        def __init__(self, x, y):
+            self.x = x
+            self.y = y
+
+    @dataclass
+    class Point:
+        x: int
+        y: int
+
+        def __post_init__(self):
+            if self.x < 0:
+                raise ValueError("negative x")
+
+    table = caseof.compile(
+        m.cls(Vector, 0, 0) >> "zero vector",
+        m.cls(Vector, _, y=0) >> (lambda x: ("horizontal", x)),
+        m(Point, x=0, y=int) >> (lambda y: ("vertical", y)),
+        m.cls(Point, _, y="a") >> (lambda x: ("labelled", x)),
+        m.cls(int, X > 10) >> "big int",
+        m.cls(Point) >> "a point",
+        _ >> "other",
+    )
+
+    assert table(Vector(0, 0)) == "zero vector"
+    assert table(Vector(3, 0)) == ("horizontal", 3)
+    assert table(Vector(3, 1)) == "other"
+    assert table(Point(0, 2)) == ("vertical", 2)
+    assert table(Point(1, "a")) == ("labelled", 1)
+    assert table(Point(1, 2)) == "a point"
+    assert table(11) == "big int"
+    assert table(True) == "other"
+
+    assert ~(caseof(Point(1, "a")) | m.cls(Point, _, y=str) >> (lambda x, y: (x, y))) == (1, "a")
+    assert repr(m(Point, x=0, y=int).pattern) == "Point(x=0, y=<class 'int'>)"
+
+    with pytest.raises(TypeError):
+        m.cls(Vector, 1, 2, 3)
+    with pytest.raises(TypeError):
+        m.cls(Vector, 1, x=1)
+    with pytest.raises(TypeError):
+        m.cls(Point(1, 2))
+
+
+def test_nested_class_patterns():
+    from dataclasses import dataclass
+
+    @dataclass
+    class Point:
+        x: int
+        y: int
+
+    @dataclass
+    class Line:
+        a: Point
+        b: Point
+
+    @dataclass
+    class Rect:
+        top: Line
+        left: Line
+
+    table = caseof.compile(
+        m(Rect, top=m(Line, a=m(Point, x=0)), left=_) >> (lambda left: ("at x=0", left.a)),
+        m.cls(Rect, m.cls(Line, m.cls(Point, _, 0), _), _) >> (lambda x, b, left: ("at y=0", x)),
+        m(Line, a=m(Point, x=m(int) | m(float))) >> "line",
+        _ >> "other",
+    )
+    line = Line(Point(1, 0), Point(2, 2))
+    values = [
+        Rect(Line(Point(0, 5), Point(1, 1)), line),
+        Rect(line, line),
+        Rect(Line(Point(1, 1), Point(1, 1)), line),
+        line,
+        Line(Point("a", 0), line.b),
+    ]
+    expected = [("at x=0", Point(1, 0)), ("at y=0", 1), "other", "line", "other"]
+    assert [table(value) for value in values] == expected
+    assert [~(caseof(value) | table.cases[0] | table.cases[1] | table.cases[2] | table.cases[3]) for value in values] == expected
+
+
+def test_class_patterns_of_any_attribute_name():
+    from dataclasses import dataclass
+
+    @dataclass
+    class Node:
+        cls: str
+        pattern: str
+        self: int
+
+    table = caseof.compile(
+        m(Node, cls="a", pattern=_) >> (lambda pattern: ("a", pattern)),
+        m.cls(Node, self=1, cls=_) >> (lambda cls: ("one", cls)),
+        _ >> "other",
+    )
+    assert table(Node("a", "p", 0)) == ("a", "p")
+    assert table(Node("b", "p", 1)) == ("one", "b")
+    assert table(Node("b", "p", 2)) == "other"
+
+    with pytest.raises(TypeError):
+        m.cls()
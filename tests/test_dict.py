@@ -45,3 +45,22 @@ def test_with_xobject_action():
 
     assert ~(caseof(pet) | m({"details": {"age": _}}) >> X) == 3
     assert ~(caseof(pet) | m({_: {"age": _}}) >> X[0].upper()) == "DETAILS"
+
+
+def test_string_keys_are_looked_up():
+    event = {"key%d" % i: i for i in range(50)}
+
+    assert ~(caseof(event) | m({"key49": _, "key0": 0}) >> (lambda x: x)) == 49
+    assert not ~(caseof(event, strict=False) | m({"key50": _}) >> True)
+    assert not ~(caseof({1: "a"}, strict=False) | m({"1": _}) >> True)
+
+
+def test_wildcard_keys_consume_in_pattern_order():
+    assert not ~(caseof({"a": 1}, strict=False) | m({_: int, "a": 1}) >> True)
+    assert ~(caseof({"b": 2, "a": 1}) | m({_: int, "a": 1}) >> (lambda k, v: (k, v))) == ("b", 2)
+    assert ~(caseof({"a": 1, "b": 2}) | m({"a": 1, _: int}) >> (lambda k, v: (k, v))) == ("b", 2)
+
+    table = caseof.compile(m({_: int, "a": 1}) >> (lambda k, v: (k, v)), _ >> None)
+    assert table({"a": 1}) is None
+    assert table({"a": 1, "b": 2}) is None
+    assert table({"b": 2, "a": 1}) == ("b", 2)
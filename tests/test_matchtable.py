@@ -0,0 +1,495 @@
+import sys
+
+import pytest
+
+from xpattern import HEAD
+from xpattern import TAIL
+from xpattern import MatchError
+from xpattern import X
+from xpattern import _
+from xpattern import caseof
+from xpattern import m
+
+
+# fmt: off
+def test_compile():
+    table = caseof.compile(
+        m(1) >> "one",
+        m(int) >> (lambda x: x * 2),
+        m(str) >> X.upper(),
+        m(1, TAIL) >> (lambda tail: tail),
+        _ >> "other",
+    )
+
+    assert table(1) == "one"
+    assert table(3) == 6
+    assert table("abc") == "ABC"
+    assert table([1, 2, 3]) == [2, 3]
+    assert table(1, 2) == [2]
+    assert table(None) == "other"
+
+
+def test_compile_reuses_cases():
+    table = caseof.compile(m(1) >> "one", m(2) >> "two")
+
+    assert [table(v) for v in (1, 2, 2, 1)] == ["one", "two", "two", "one"]
+    assert table.cases == tuple(table.cases)
+
+
+def test_compile_default():
+    with pytest.raises(MatchError):
+        caseof.compile(m(1) >> "one")(2)
+
+    assert caseof.compile(m(1) >> "one", strict=False)(2) is False
+    assert caseof.compile(m(1) >> "one", default=0)(2) == 0
+
+
+def test_compile_rejects_non_matchline():
+    from xpattern._xpattern import CaseError
+
+    with pytest.raises(CaseError):
+        caseof.compile(m(1) >> "one", "two")
+
+
+def test_caseof_xobject_is_compiled():
+    table = ~(caseof(X)
+        | m(int, int) >> (lambda x, y: x + y)
+        | m(str, int) >> (lambda x, y: y)
+    )
+
+    assert table(1, 2) == 3
+    assert table("a", 2) == 2
+    assert table([3, 4]) == 7
+
+
+def test_index_keeps_first_match_order():
+    cases = [
+        m(int) >> "int",
+        m(3) >> "three",
+        m(True) >> "true",
+        m("a") >> "a",
+        m(str) >> "str",
+        m([]) >> "empty",
+        m(1, TAIL) >> "one and tail",
+        m(_, _) >> "pair",
+        m(HEAD, TAIL) >> "head and tail",
+        m({"a": _}) >> "dict",
+        m(X == 4.0) >> "four",
+        _ >> "other",
+    ]
+    table = caseof.compile(*cases)
+
+    values = [3, True, False, "a", "b", [], (), [1], [1, 2], (2, 3), [2, 3, 4],
+              "ab", {"a": 1}, {"b": 1}, 4.0, 5.0, None, range(3), {1, 2}]
+    for value in values:
+        expected = ~(caseof(value) | cases[0] | cases[1] | cases[2] | cases[3]
+                     | cases[4] | cases[5] | cases[6] | cases[7] | cases[8]
+                     | cases[9] | cases[10] | cases[11])
+        assert table(value) == expected, value
+
+
+def test_index_large_literal_table():
+    table = caseof.compile(*[m(i) >> i * 10 for i in range(60)], m(int) >> "int")
+
+    assert [table(i) for i in range(60)] == [i * 10 for i in range(60)]
+    assert table(60) == "int"
+    with pytest.raises(MatchError):
+        table(1.0)
+
+
+def test_index_cache_is_bounded():
+    table = caseof.compile(m(int) >> "int", m(str) >> "str", _ >> "other")
+    index = table._index
+    index.cache_size = 2
+
+    classes = [type("Event%d" % i, (object,), {}) for i in range(3)]
+    assert [table(cls()) for cls in classes] == ["other"] * 3
+    assert list(index.cache) == classes[1:]
+
+    assert table(classes[1]()) == "other"
+    assert table(1) == "int"
+    assert list(index.cache) == [classes[1], int]
+
+
+def test_map():
+    table = caseof.compile(
+        m(1) >> "one",
+        m(int) >> X * 2,
+        m(str) >> X.upper(),
+        _ >> None,
+    )
+
+    assert table.map([1, 2, "a", 1.0]) == ["one", 4, "A", None]
+    assert table.map(iter([1, 2])) == ["one", 4]
+    assert table.map([]) == []
+
+
+def test_map_numpy():
+    np = pytest.importorskip("numpy")
+
+    table = caseof.compile(
+        m(X > 10) >> "big",
+        m(X < 0) >> "negative",
+        m(0) >> "zero",
+        _ >> "small",
+    )
+    values = np.array([11, -1, 0, 5])
+    assert table.map(values).tolist() == ["big", "negative", "zero", "small"]
+
+    table = caseof.compile(m(X % 2 == 0) >> X // 2, m(int) >> X * 3 + 1)
+    assert table.map(np.arange(5)).tolist() == [0, 4, 1, 10, 2]
+
+    table = caseof.compile(m(float) >> "float", m(bool) >> "bool", m(int) >> "int")
+    assert table.map(np.array([0, 2])).tolist() == ["int", "int"]
+    assert table.map(np.array([0.5])).tolist() == ["float"]
+    assert table.map(np.array([True])).tolist() == ["bool"]
+
+
+def test_map_numpy_is_dispatch():
+    np = pytest.importorskip("numpy")
+
+    tables = [
+        caseof.compile(m(X > 5) >> "big", m(X >= 0) >> X * 2, default="neg"),
+        caseof.compile(m(X > 0) >> (X + 2 ** 62) * 2, _ >> [0, 1]),
+        caseof.compile(m(0) >> None, m(False) >> "false", m(bool) >> ~X, m(int) >> 10 // X),
+        caseof.compile(m(X != 0) >> 1 / X, _ >> X),
+        caseof.compile(m(X > 0.1) >> "gt", m(0.5) >> "half", m(float) >> X * 3, _ >> "le"),
+    ]
+    arrays = [
+        np.array([1, 7, -3, 0]),
+        np.array([True, False]),
+        np.array([2.0, 0.0, -0.5]),
+        np.array([0.1, 0.5, -0.1], dtype=np.float32),
+        np.array([0.1, 0.5], dtype=np.float16),
+    ]
+
+    def outcome(dispatch):
+        try:
+            return dispatch()
+        except Exception as e:
+            return type(e)
+
+    for table in tables:
+        for values in arrays:
+            expected = outcome(lambda: [table(v) for v in values.tolist()])
+            assert outcome(lambda: table.map(values).tolist()) == expected, (table, values)
+
+    for candidates, values in [
+        (("a", 1), np.array([1, 2])),
+        ([[2], 3], np.array([2, 3])),
+        ("abc", np.array(["ab", "d"])),
+        ([1, 2.5], np.array([1.0, 2.5, 3.0])),
+        (["1"], np.array([1, 2])),
+        ([1], np.array(["1", "2"])),
+        (["ab"], np.array(["ab", "a"])),
+    ]:
+        table = caseof.compile(m(X._in_(candidates)) >> "y", _ >> "n")
+        assert table.map(values).tolist() == [table(v) for v in values.tolist()], candidates
+
+    with pytest.raises(ZeroDivisionError):
+        caseof.compile(m(int) >> X // 0).map(np.array([1, 2]))
+    with pytest.raises(ZeroDivisionError):
+        caseof.compile(m(float) >> X / 0).map(np.array([1.0]))
+
+
+def test_map_numpy_unhandled():
+    np = pytest.importorskip("numpy")
+
+    table = caseof.compile(m(2) >> "two")
+    with pytest.raises(MatchError):
+        table.map(np.array([1, 2]))
+
+    table = caseof.compile(m(2) >> "two", default="other")
+    assert table.map(np.array([1, 2])).tolist() == ["other", "two"]
+
+
+def test_map_numpy_fallback():
+    np = pytest.importorskip("numpy")
+
+    table = caseof.compile(m(1, _) >> (lambda x: x), m(int) >> (lambda x: -x), _ >> None)
+    assert table.map(np.array([[1, 2], [2, 3]])).tolist() == [2, None]
+    assert table.map(np.array([1, 2])).tolist() == [-1, -2]
+
+
+def make_parallel_table():
+    return caseof.compile(
+        m(0) >> "zero",
+        m(str) >> None,
+        m(X % 2 == 0) >> X // 2,
+        m(int) >> X * 3 + 1,
+    )
+
+
+def test_pickle_table():
+    import pickle
+
+    table = pickle.loads(pickle.dumps(make_parallel_table()))
+    assert table.map([0, 1, 2, "a"]) == ["zero", 4, 1, None]
+
+
+@pytest.mark.parametrize("executor_type", ["thread", "process"])
+def test_map_in_executor(executor_type):
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures import ThreadPoolExecutor
+
+    executor_class = ThreadPoolExecutor if executor_type == "thread" else ProcessPoolExecutor
+    table = make_parallel_table()
+    values = list(range(1000)) + ["a"]
+    with executor_class(max_workers=2) as executor:
+        assert table.map(values, executor=executor, chunksize=64) == table.map(values)
+        assert table.map([], executor=executor) == []
+
+
+def test_process_pool_installs_the_table_once():
+    table = make_parallel_table()
+    values = list(range(200)) + ["a"]
+    with table.process_pool(max_workers=2) as executor:
+        payloads = []
+        submit = executor.submit
+
+        def spy(func, token, payload, chunk):
+            payloads.append(payload)
+            return submit(func, token, payload, chunk)
+
+        executor.submit = spy
+        assert table.map(values, executor=executor, chunksize=16) == table.map(values)
+        assert payloads and not any(payloads)
+
+        # another table is still sent with its chunks
+        other = caseof.compile(m(int) >> X + 1, _ >> None)
+        assert other.map(values, executor=executor, chunksize=64) == other.map(values)
+        assert all(payloads[-4:])
+
+
+def test_pickle_matchers():
+    import pickle
+
+    cases = (caseof(X)
+        | (m(1) | m(2)) >> "one or two"
+        | (m(X > 2) & ~m(5)) >> "big"
+        | _ >> X
+    )
+    restored = pickle.loads(pickle.dumps(cases))
+    table = ~restored
+
+    assert [table(v) for v in (1, 2, 3, 5)] == ["one or two", "one or two", "big", 5]
+    assert ~(caseof(2) | restored.cases[0]) == "one or two"
+
+
+def test_shared_guards_are_evaluated_once():
+    class Event:
+        reads = 0
+
+        def __init__(self, kind, size):
+            self._kind = kind
+            self.size = size
+
+        @property
+        def kind(self):
+            Event.reads += 1
+            return self._kind
+
+    cases = (
+        m(X.kind == "a") >> "a",
+        m(X.kind == "b") >> "b",
+        m((X.kind == "c") & (X.size > 1)) >> "big c",
+        m(X.kind._in_(["c", "d"])) >> X.kind,
+        _ >> "other",
+    )
+
+    # native tables keep shared guards on the graph
+    for table in (caseof.compile(*cases), caseof.compile(*cases, native=True)):
+        for event, expected in [
+            (Event("a", 0), "a"),
+            (Event("c", 2), "big c"),
+            (Event("c", 0), "c"),
+            (Event("d", 0), "d"),
+            (Event("e", 0), "other"),
+        ]:
+            Event.reads = 0
+            assert table(event) == expected
+            assert Event.reads == (2 if expected in ("c", "d") else 1)
+
+    with pytest.raises(MatchError):
+        caseof.compile(m(X.size + 1) >> 1, m(X.size > 1) >> 2)(Event("a", 0))
+
+
+def test_xobject_operands_do_not_depend_on_sharing():
+    from xpattern import xcompile
+
+    class Strict:
+        def __init__(self, n):
+            self.n = n
+
+        def __eq__(self, other):
+            return isinstance(other, Strict) and self.n == other.n
+
+    class Pair:
+        a = Strict(1)
+        b = Strict(1)
+
+    shared = caseof.compile(m(X.a.n == 5) >> "five", m(X.a == X.b) >> "eq", _ >> "ne")
+    alone = caseof.compile(m(X.a == X.b) >> "eq", _ >> "ne")
+    generated = caseof.compile(m(xcompile(X.a == X.b)) >> "eq", _ >> "ne")
+    interpreted = ~(caseof(Pair()) | m(X.a == X.b) >> "eq" | _ >> "ne")
+    assert shared(Pair()) == alone(Pair()) == generated(Pair()) == interpreted == "eq"
+
+
+def test_stream():
+    from itertools import count
+    from itertools import islice
+
+    table = caseof.compile(
+        m(X % 15 == 0) >> "fizzbuzz",
+        m(X % 5 == 0) >> "buzz",
+        m(X % 3 == 0) >> "fizz",
+    )
+
+    stream = table.stream(count(1), skip_unmatched=True)
+    assert list(islice(stream, 4)) == ["fizz", "buzz", "fizz", "fizz"]
+
+    stream = table.stream(count(1), skip_unmatched=True, with_index=True)
+    assert list(islice(stream, 7)) == [(2, "fizz"), (1, "buzz"), (2, "fizz"), (2, "fizz"), (1, "buzz"), (2, "fizz"), (0, "fizzbuzz")]
+
+    table = caseof.compile(m(1) >> "one", m(2) >> "two")
+    with pytest.raises(MatchError):
+        list(table.stream([1, 3]))
+    assert list(caseof.compile(m(1) >> "one", default="other").stream([1, 3], with_index=True)) == [(0, "one"), (None, "other")]
+
+
+def test_iterators_are_matched_lazily():
+    from itertools import count
+
+    from xpattern import REST
+
+    def records():
+        yield "header"
+        yield 2
+        for i in count():
+            yield i
+
+    table = caseof.compile(
+        m("header", 1, REST) >> (lambda rest: "one"),
+        m("header", 2, REST) >> (lambda rest: [next(rest), next(rest)]),
+        _ >> "other",
+    )
+    assert table(records()) == [0, 1]
+
+    assert ~(caseof(iter([1, 2, 3]))
+        | m(1, 2) >> "short"
+        | m(HEAD, TAIL) >> (lambda head, tail: (head, list(tail)))
+    ) == (1, [2, 3])
+    assert ~(caseof(iter([1, 2]))
+        | m(1, 2, 3) >> "long"
+        | m(1, 2) >> "exact"
+    ) == "exact"
+
+    # arms after a sequence pattern still see the whole iterator
+    table = caseof.compile(m(1, 2, 3, TAIL) >> "long", _ >> X)
+    assert list(table(iter([1, 2]))) == [1, 2]
+    assert list(caseof.compile(m(1, 2) >> list)(iter([1, 2]))) == [1, 2]
+
+
+def test_iterators_are_not_shared_by_guards():
+    import types
+
+    from xpattern import xfunction
+
+    first = xfunction(lambda it: next(iter(it)))
+    cases = [
+        m(9, TAIL) >> "nine",
+        m(first(X) == 1) >> (lambda it: ("one", list(it))),
+        m(first(X) == 2) >> "two",
+    ]
+    assert caseof.compile(*cases)(iter([1, 2, 3])) == ("one", [1, 2, 3])
+    assert caseof.compile(*cases[:2])(iter([1, 2, 3])) == ("one", [1, 2, 3])
+
+    table = caseof.compile(
+        m(9, TAIL) >> "nine",
+        m(types.GeneratorType) >> (lambda generator: list(generator)),
+    )
+    assert table(x for x in [1, 2]) == [1, 2]
+
+
+def test_views():
+    from xpattern._views import SequenceView
+
+    def total(values):
+        return ~(caseof(values, views=True)
+            | m(HEAD, TAIL) >> (lambda head, tail: head + total(tail))
+            | m([]) >> 0
+        )
+
+    assert total(list(range(100))) == sum(range(100))
+    assert total((1, 2, 3)) == 6
+
+    table = caseof.compile(
+        m(1, TAIL) >> (lambda tail: tail),
+        m({"data": [0xFF, TAIL]}) >> (lambda tail: tail),
+        views=True,
+    )
+    tail = table([1, 2, 3, 4])
+    assert isinstance(tail, SequenceView)
+    assert tail == [2, 3, 4] and tail[1:] == (3, 4) and tail[-1] == 4 and tail[::2] == [2, 4]
+    assert isinstance(tail[1:], SequenceView) and len(tail[5:]) == 0
+
+    tail = table({"data": b"\xff\x01\x02"})
+    assert isinstance(tail, memoryview) and tail.tobytes() == b"\x01\x02"
+    assert bytes(table({"data": memoryview(b"\xff\x03")})) == b"\x03"
+
+    assert caseof.compile(m(1, TAIL) >> (lambda tail: tail))([1, 2]) == [2]
+
+    # views of views stay within the parent view
+    parent = SequenceView(list(range(10)), 2, 5)
+    assert SequenceView(parent, 0, 10) == [2, 3, 4]
+    assert SequenceView(parent, 1) == [3, 4] and len(SequenceView(parent, 7)) == 0
+
+
+@pytest.mark.skipif(sys.version_info < (3, 10), reason="match statement")
+def test_native():
+    from dataclasses import dataclass
+
+    @dataclass
+    class Point:
+        x: int
+        y: int
+
+    cases = (
+        m(None) >> "none",
+        m(True) >> "true",
+        m(1) >> "one",
+        m(1.5) >> "one and a half",
+        m("a") >> "a",
+        m(Point(0, _)) >> (lambda y: ("x axis", y)),
+        m.cls(Point, x=_, y=int) >> (lambda x, y: ("point", x, y)),
+        m({"n": X > 10}) >> "big",
+        m(int) >> (lambda x: ("int", x)),
+        m({"id": _, "tags": [_, TAIL]}) >> (lambda id, tag, tags: (id, tag, tags)),
+        m(HEAD, 2, TAIL) >> (lambda head, tail: (head, tail)),
+        m([1, [2, _]]) >> (lambda x: ("nested", x)),
+        m(str, str) >> (lambda a, b: a + b),
+        m(lambda x: x == "b") >> "b",
+        m(_) >> (lambda x: ("other", x)),
+    )
+    compiled = caseof.compile(*cases)
+    native = caseof.compile(*cases, native=True)
+    assert native._native_index is not None
+
+    values = [
+        None, True, False, 1, 1.0, 1.5, "a", "b", Point(0, 3), Point(1, 2),
+        Point(1, "y"), {"n": 11}, {"n": 5}, 5, {"id": 3, "tags": ["x", "y"]}, {"id": 3, "tags": []},
+        [0, 2, 3], (0, 2), [1, [2, 3]], [1, (2, 3)], ("a", "b"), "ab",
+        {"a", "b"}, [], 2.5,
+    ]
+    for value in values:
+        expected = compiled(value)
+        assert native(value) == expected, value
+
+    head, tail = native(iter([0, 2, 3]))
+    assert head == 0 and list(tail) == [3]
+    assert caseof.compile(m(1) >> "one", strict=False, native=True)(2) is False
+
+    from types import MappingProxyType
+
+    mappings = caseof.compile(m({"n": _}) >> (lambda n: n), _ >> None, native=True)
+    assert mappings({"n": 1}) == 1 and mappings(MappingProxyType({"n": 1})) is None
@@ -7,6 +7,7 @@ from xpattern import X
 from xpattern import _
 from xpattern import caseof
 from xpattern import m
+from xpattern import xcompile
 from xpattern import xfunction
 
 
@@ -15,9 +16,7 @@ class Item(object):
 
 
 # fmt: off
-@pytest.mark.parametrize(
-    "x_expression, argument, expected",
-    [
+OPERATOR_CASES = [
         (+X, 1, 1),
         (+X, -1, -1),
         (-X, 1, -1),
@@ -29,6 +28,8 @@ class Item(object):
         (X / 2, 1, 0.5),
         (X // 2, 1, 0),
         (X % 2, 3, 1),
+        ((-2) ** X, 2, 4),
+        ((-2.0) ** X, 3, -8.0),
         (X ** 2, 3, 9),
         (X << 2, 3, 12),
         (X >> 2, 9, 2),
@@ -98,8 +99,10 @@ class Item(object):
         (X + X, 7, 14),
         (X ** 2 - 3 + X, 6, 39),
         (X ** (2 - 3 + X), 6, 7776),
-    ],
-)
+]
+
+
+@pytest.mark.parametrize("x_expression, argument, expected", OPERATOR_CASES)
 def test_operators(x_expression, argument, expected):
     assert x_expression._x_func(argument) == expected
 
@@ -242,3 +245,169 @@ def test_xfunction_pattern():
         | m(greater_than_4(X)) >> "greater than 4"
         | _ >> "equal or lesser than 4"
     ) == "equal or lesser than 4"
+
+
+def test_xobject_records_operations():
+    expression = X.a[0] + 1 > 5
+
+    assert expression._x_ops == (("getattr", "a"), ("getitem", 0), ("add", 1), ("gt", 5))
+    assert repr(expression) == "X.a |> X[0] |> X + 1 |> X > 5"
+    assert expression._x_func is expression._x_func
+
+
+def test_long_xobject_chain():
+    expression = X
+    for _i in range(5000):
+        expression = expression + 1
+
+    assert expression._x_func(0) == 5000
+
+
+@pytest.mark.parametrize("x_expression, argument, expected", OPERATOR_CASES)
+def test_xcompile_operators(x_expression, argument, expected):
+    assert xcompile(x_expression)._x_func(argument) == expected
+
+
+def test_xcompile():
+    class Order(object):
+        price = 10
+        qty = 200
+
+    expression = xcompile((X.price * X.qty) > 1000)
+
+    assert expression._x_func(Order())
+    assert repr(expression) == "X.price |> X * X.qty |> X > 1000"
+    assert expression._not()._x_func(Order()) is False
+    assert ~(caseof(Order())
+        | m(expression) >> xcompile(X.price + 1)
+    ) == 11
+
+
+def test_vectorize():
+    np = pytest.importorskip("numpy")
+    from xpattern import vectorize
+
+    values = np.arange(10)
+    assert vectorize((X * 2 + 1) > 10)(values).tolist() == [v * 2 + 1 > 10 for v in range(10)]
+    assert vectorize(X + X * 3)(values).tolist() == [v * 4 for v in range(10)]
+    assert vectorize(1 - X)(values).tolist() == [1 - v for v in range(10)]
+    assert vectorize(X._in_([1, 3]) & (X > 2))(values).tolist() == [v == 3 for v in range(10)]
+    assert vectorize((X > 2)._not())(values).tolist() == [v <= 2 for v in range(10)]
+    assert vectorize(X)(values) is values
+
+    records = np.array([(1.0, 2), (3.0, 4)], dtype=[("price", float), ("qty", int)])
+    assert vectorize(X["price"] * X["qty"])(records).tolist() == [2.0, 12.0]
+
+    with pytest.raises(TypeError):
+        vectorize(X.upper())
+    with pytest.raises(TypeError):
+        vectorize(X[0])
+    with pytest.raises(TypeError):
+        vectorize(X._in_(["a", 1]))
+    with pytest.raises(TypeError):
+        vectorize(X._in_("abc"))
+
+
+def test_pickle_xobject():
+    import pickle
+
+    expression = pickle.loads(pickle.dumps(X.a[0] + X._in_([1, 2]) > 5))
+    assert repr(expression) == repr(X.a[0] + X._in_([1, 2]) > 5)
+    assert pickle.loads(pickle.dumps(X))._x_func is None
+    assert pickle.loads(pickle.dumps(xcompile(X * 2)))._x_func(2) == 4
+
+
+@xfunction
+def scaled_length(items, scale=1):
+    return len(items) * scale
+
+
+def test_xfunction_evaluates_arguments():
+    assert scaled_length(X, scale=X[0])._x_func([3, 1]) == 6
+    assert ~(caseof([1, 2, 3])
+        | m(scaled_length(X) > 2) >> scaled_length(X[1:])
+    ) == 2
+
+
+def test_pickle_xfunction():
+    import copy
+    import pickle
+
+    expression = scaled_length(X.items, scale=X.scale + 1) > 3
+    for restored in [pickle.loads(pickle.dumps(expression)), copy.deepcopy(expression), copy.copy(expression)]:
+        assert restored._x_ops[0][1][0] is scaled_length
+        assert restored._x_func(type("Bag", (), {"items": [1, 2], "scale": 1})())
+
+
+def test_xfunction_shares_subexpressions():
+    class Record:
+        reads = 0
+
+        @property
+        def payload(self):
+            Record.reads += 1
+            return {"items": [1, 2, 3]}
+
+    @xfunction
+    def pair(a, b):
+        return a, b
+
+    expression = pair(X.payload["items"], scaled_length(X.payload["items"], scale=2))
+    assert expression._x_func(Record()) == ([1, 2, 3], 6)
+    assert Record.reads == 1
+
+    Record.reads = 0
+    assert pair(X.payload, X.payload)._x_func(Record()) == ({"items": [1, 2, 3]},) * 2
+    assert Record.reads == 1
+
+    # operands of the same value but different types are never shared
+    assert pair(X + 1, X + 1.0)._x_func(1) == (2, 2.0)
+    assert repr(pair(X + 1, X + 1.0)._x_func(1)[1]) == "2.0"
+    assert pair(X * 0.0, X * -0.0)._x_func(1.0)[1].hex() == "-0x0.0p+0"
+
+    table = caseof.compile(
+        m((X.real * 0.0).hex() == "nope") >> "pos",
+        m((X.real * -0.0).hex() == "-0x0.0p+0") >> "neg",
+        _ >> "other",
+    )
+    assert table(1.0) == "neg"
+
+
+def test_in_hashes_candidates():
+    nan = float("nan")
+    expression = X._in_([1, "a", [2], nan])
+    assert repr(expression) == "X in [1, 'a', [2], nan]"
+    assert [expression._x_func(v) for v in (1, 1.0, "a", [2], nan, 2, "b", {})] == [
+        True, True, True, True, True, False, False, False
+    ]
+    assert xcompile(expression)._x_func([2])
+    assert X._in_(range(3))._x_func(2)
+
+
+def test_pipe_stages_are_flat():
+    from xpattern._xobject import Pipe
+    from xpattern._xobject import pipe
+
+    def double(x):
+        return x * 2
+
+    transform = pipe | X.a | double | X + 1 | (pipe | X * 10)
+    assert len(transform.stages) == 4
+    assert transform.resolved
+    assert transform(Item()) == 30
+    assert repr(transform) == "X.a |> double |> X + 1 |> X * 10"
+    assert repr(pipe) == "None" and repr(pipe | double) == "double"
+
+    # a function returning an XObject has it applied to the pipe arguments
+    redispatch = pipe | double | (lambda y: X * y)
+    assert not redispatch.resolved
+    assert redispatch(3) == 18
+    assert (pipe | (lambda x: X * 3))(2) == 6
+    assert (pipe | double | (pipe | (lambda x: X + x)))(2) == 8
+    assert (pipe | (lambda x: X + 1) | X)(1) == 2
+    assert repr(pipe | double | X) == "double |> X"
+
+    # None stages are dropped
+    assert (Pipe(None) | double)(2) == 4
+    assert Pipe(double, None).stages == (double,)
+    assert Pipe(None).func is None
@@ -7,7 +7,21 @@ from pampy import TAIL as TAIL
 from pampy import MatchError as MatchError
 from pampy import _ as _
 
+from ._patterns import F32 as F32
+from ._patterns import F64 as F64
+from ._patterns import I8 as I8
+from ._patterns import I16 as I16
+from ._patterns import I32 as I32
+from ._patterns import I64 as I64
+from ._patterns import U8 as U8
+from ._patterns import U16 as U16
+from ._patterns import U32 as U32
+from ._patterns import U64 as U64
+from ._patterns import Field as Field
+from ._vector import vectorize as vectorize
 from ._xobject import X as X
+from ._xobject import xcompile as xcompile
 from ._xobject import xfunction as xfunction
+from ._xpattern import acaseof as acaseof
 from ._xpattern import caseof as caseof
 from ._xpattern import m as m
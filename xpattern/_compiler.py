@@ -0,0 +1,694 @@
+import re
+
+from abc import ABCMeta
+from collections import OrderedDict
+from collections.abc import Iterable
+from collections.abc import Iterator
+from dataclasses import fields
+from enum import Enum
+from functools import lru_cache
+from inspect import isawaitable
+from itertools import chain
+from operator import attrgetter
+from typing import Pattern as RegexPattern
+
+from pampy import HEAD
+from pampy import TAIL
+from pampy import MatchError
+from pampy import _
+from pampy.helpers import UnderscoreType
+from pampy.helpers import is_dataclass
+from pampy.helpers import is_typing_stuff
+from pampy.pampy import match_iterable as pampy_match_iterable
+from pampy.pampy import match_typing_stuff
+from pampy.pampy import match_value as pampy_match_value
+
+from ._views import SequenceView
+from ._views import view
+from ._xobject import XGraph
+from ._xobject import XObject
+
+
+# matchers never mutate the extracted list they return, so the common results
+# are shared instead of being allocated on every call
+MATCHED = (True, [])
+NO_MATCH = (False, [])
+MISSING = object()
+
+
+class Pattern(object):
+    """
+    base class of structured patterns, which compile their own matcher
+    """
+
+    def compile(self):
+        raise NotImplementedError
+
+    def index_key(self):
+        """
+        describe which values could possibly match, see `index_key`
+        """
+        return None
+
+    @property
+    def matcher(self):
+        matcher = self.__dict__.get("_matcher")
+        if matcher is None:
+            matcher = self._matcher = self.compile()
+        return matcher
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_matcher", None)
+        return state
+
+
+def compile_pattern(pattern, views=False):
+    """
+    compile pattern into a matcher, `matcher(value) -> (matched, extracted)`
+
+    With `views`, TAIL of sequence patterns is bound as a zero-copy view.
+    """
+    if isinstance(pattern, XObject):
+        return compile_xobject(pattern)
+    elif isinstance(pattern, Pattern):
+        return pattern.compile()
+    elif isinstance(pattern, dict):
+        return compile_dict(pattern, views)
+    elif pattern == _:
+        return match_any
+    elif is_record(pattern):
+        return compile_dataclass(pattern, views)
+    elif is_typing_stuff(pattern):
+        return lambda value: match_typing_stuff(pattern, value)
+    elif isinstance(pattern, (int, float, str, bool, Enum)):
+        return compile_literal(pattern)
+    elif pattern is None:
+        return match_none
+    elif isinstance(pattern, type):
+        return compile_type(pattern)
+    elif isinstance(pattern, (list, tuple)):
+        return compile_iterable(pattern, views)
+    elif callable(pattern):
+        return compile_callable(pattern)
+    elif isinstance(pattern, RegexPattern):
+        return compile_regex(pattern)
+    elif pattern is HEAD or pattern is TAIL:
+        return match_misplaced_head_or_tail
+
+    return lambda value: pampy_match_value(pattern, value)
+
+
+def match_any(value):
+    return True, [value]
+
+
+def match_none(value):
+    return MATCHED if value is None else NO_MATCH
+
+
+def match_misplaced_head_or_tail(value):
+    raise MatchError(
+        "HEAD or TAIL should only be used inside an Iterable (list or tuple)."
+    )
+
+
+def compile_xobject(pattern):
+    func = pattern._x_func
+    check = compile_guard(pattern)
+    return lambda value: check(func(value))
+
+
+def compile_guard(pattern):
+    """
+    compile the check of a XObject pattern result, `check(result) -> (matched, [])`
+    """
+
+    def check(return_value):
+        if not isinstance(return_value, bool):
+            raise MatchError(
+                f"Warning! XObject matcher {pattern} is not returning a boolean"
+                f", but instead {return_value}"
+            )
+        return MATCHED if return_value else NO_MATCH
+
+    return check
+
+
+def share_guards(patterns):
+    """
+    intern the XObject patterns into one XGraph, returns `(graph, nodes)`
+
+    `nodes` has the graph node of every XObject pattern and None for the other
+    patterns, graph is None if the patterns share no sub-expression.
+    """
+    graph = XGraph()
+    nodes = []
+    for pattern in patterns:
+        if isinstance(pattern, XObject) and pattern._x_ops and not pattern._x_codegen:
+            nodes.append(graph.add(pattern))
+        else:
+            nodes.append(None)
+
+    if not graph.shared:
+        return None, [None] * len(nodes)
+    return graph, nodes
+
+
+def compile_literal(pattern):
+    pattern_type = type(pattern)
+
+    def match(value):
+        if type(value) is pattern_type and pattern == value:
+            return MATCHED
+        return NO_MATCH
+
+    return match
+
+
+def compile_literals(patterns):
+    """
+    compile alternative literals into one hashed lookup
+    """
+    keys = frozenset((type(pattern), pattern) for pattern in patterns)
+
+    def match(value):
+        try:
+            return MATCHED if (type(value), value) in keys else NO_MATCH
+        except TypeError:
+            # unhashable values are never equal to a literal
+            return NO_MATCH
+
+    return match
+
+
+def compile_types(patterns):
+    """
+    compile alternative types into one isinstance check
+    """
+    types = tuple(patterns)
+
+    def match(value):
+        if isinstance(value, types):
+            return True, [value]
+        return NO_MATCH
+
+    return match
+
+
+def compile_type(pattern):
+    def match(value):
+        if isinstance(value, pattern):
+            return True, [value]
+        return NO_MATCH
+
+    return match
+
+
+def compile_callable(pattern):
+    check = compile_callable_check(pattern)
+    return lambda value: check(value, pattern(value))
+
+
+def compile_callable_check(pattern):
+    """
+    compile the check of a function pattern result, `check(value, result)`
+    """
+
+    def check(value, return_value):
+        if isinstance(return_value, bool):
+            return (True, [value]) if return_value else NO_MATCH
+        elif (
+            isinstance(return_value, tuple)
+            and len(return_value) == 2
+            and isinstance(return_value[0], bool)
+            and isinstance(return_value[1], list)
+        ):
+            return return_value
+        else:
+            raise MatchError(
+                "Warning! pattern function %s is not returning a boolean "
+                "nor a tuple of (boolean, list), but instead %s"
+                % (pattern, return_value)
+            )
+
+    return check
+
+
+def is_function_pattern(pattern):
+    """
+    whether pattern is compiled as a function called with the value
+    """
+    return (
+        callable(pattern)
+        and not isinstance(pattern, (type, XObject, Pattern))
+        and not is_record(pattern)
+        and not is_typing_stuff(pattern)
+    )
+
+
+def compile_async_pattern(pattern, views=False):
+    """
+    compile a top level pattern for async dispatch, `await matcher(value)`
+
+    Awaitables returned by XObject or function patterns are awaited, the other
+    patterns are matched like `compile_pattern`.
+    """
+    if isinstance(pattern, XObject) and pattern._x_ops:
+        func = pattern._x_func
+        guard = compile_guard(pattern)
+
+        def check(value, return_value):
+            return guard(return_value)
+
+    elif is_function_pattern(pattern):
+        func = pattern
+        check = compile_callable_check(pattern)
+    else:
+        matcher = compile_pattern(pattern, views)
+
+        async def match(value):
+            return matcher(value)
+
+        return match
+
+    async def match(value):
+        return_value = func(value)
+        if isawaitable(return_value):
+            return_value = await return_value
+        return check(value, return_value)
+
+    return match
+
+
+# characters which end the literal prefix of a regex, the ones which make the
+# previous character optional as well
+REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+REGEX_OPTIONAL = set("*?{")
+
+
+def literal_prefix(regex):
+    """
+    the literal every match of a `^` anchored str regex starts with, None if unknown
+    """
+    source = regex.pattern
+    if (
+        not isinstance(source, str)
+        or regex.flags & (re.IGNORECASE | re.MULTILINE | re.VERBOSE)
+        or "|" in source
+    ):
+        return None
+    elif source.startswith("^"):
+        source = source[1:]
+    elif source.startswith("\\A"):
+        source = source[2:]
+    else:
+        return None
+
+    prefix = []
+    for char in source:
+        if char in REGEX_SPECIAL:
+            if char in REGEX_OPTIONAL and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+    return "".join(prefix) or None
+
+
+def compile_regex(pattern):
+    search = pattern.search
+    prefix = literal_prefix(pattern)
+
+    def match(value):
+        if (
+            prefix is not None
+            and isinstance(value, str)
+            and not value.startswith(prefix)
+        ):
+            return NO_MATCH
+        rematch = search(value)
+        if rematch is not None:
+            return True, list(rematch.groups())
+        return NO_MATCH
+
+    return match
+
+
+def split_tail(patterns):
+    """
+    split iterable patterns into `(prefix, has_tail)`, None if HEAD or TAIL is misplaced
+    """
+    patterns = list(patterns)
+    last = len(patterns) - 1
+    for i, pattern in enumerate(patterns):
+        if (pattern is HEAD and i != 0) or (pattern is TAIL and i != last):
+            return None
+
+    if patterns and patterns[-1] is TAIL:
+        return patterns[:-1], True
+    return patterns, False
+
+
+class Replay(object):
+    """
+    buffer the items of an iterator read by sequence patterns, so the arms of a
+    dispatch can read the same prefix, the rest of the iterator is never read
+    """
+
+    def __init__(self, iterator):
+        self.iterator = iterator
+        self.items = []
+
+    def fill(self, size):
+        """
+        buffer the first `size` items, returns False if the iterator is shorter
+        """
+        items = self.items
+        while len(items) < size:
+            try:
+                items.append(next(self.iterator))
+            except StopIteration:
+                return False
+        return True
+
+    def tail(self, start):
+        return chain(self.items[start:], self.iterator)
+
+    def replay(self):
+        return self.tail(0) if self.items else self.iterator
+
+
+# with views, these are indexed in place instead of being copied into a list
+VIEWABLE = (list, tuple, SequenceView, bytes, bytearray, memoryview)
+
+
+def compile_iterable(patterns, views=False):
+    split = split_tail(patterns)
+    if split is None:
+        # misplaced HEAD or TAIL only raise once they are reached,
+        # leave them to the interpreter
+        return lambda value: pampy_match_iterable(patterns, value)
+
+    patterns, has_tail = split
+    size = len(patterns)
+    matchers = tuple(
+        match_any if pattern is HEAD else compile_pattern(pattern, views)
+        for pattern in patterns
+    )
+    indexable = VIEWABLE if views else (list, tuple, SequenceView)
+
+    def match(value):
+        if isinstance(value, indexable):
+            values = value
+        elif isinstance(value, (Replay, Iterator)):
+            return match_lazy(value if isinstance(value, Replay) else Replay(value))
+        elif isinstance(value, Iterable):
+            values = list(value)
+        else:
+            return NO_MATCH
+
+        if len(values) != size and (not has_tail or len(values) < size):
+            return NO_MATCH
+
+        total_extracted = []
+        for matcher, item in zip(matchers, values):
+            matched, extracted = matcher(item)
+            if not matched:
+                return NO_MATCH
+            total_extracted += extracted
+
+        if has_tail and views:
+            total_extracted.append(view(values, size))
+        elif has_tail:
+            tail = values[size:]
+            total_extracted.append(tail if type(tail) is list else list(tail))
+        return True, total_extracted
+
+    def match_lazy(replay):
+        # only the prefix is read, one more item to tell the length if no tail
+        if not replay.fill(size) or (not has_tail and replay.fill(size + 1)):
+            return NO_MATCH
+
+        total_extracted = []
+        for matcher, item in zip(matchers, replay.items):
+            matched, extracted = matcher(item)
+            if not matched:
+                return NO_MATCH
+            total_extracted += extracted
+
+        if has_tail:
+            total_extracted.append(replay.tail(size))
+        return True, total_extracted
+
+    return match
+
+
+def compile_dict(pattern, views=False):
+    # string keys can only match the same key, they are looked up directly,
+    # only the other pattern keys have to scan the value keys
+    matchers = tuple(
+        (
+            pkey if type(pkey) is str else None,
+            compile_pattern(pkey, views),
+            compile_pattern(pval, views),
+        )
+        for pkey, pval in pattern.items()
+    )
+    scanning = any(literal is None for literal, _match_key, _match_val in matchers)
+
+    def match(value):
+        if not isinstance(value, dict):
+            return NO_MATCH
+
+        total_extracted = []
+        used_value_keys = set() if scanning else None
+        for literal, match_key, match_val in matchers:
+            if literal is not None:
+                vval = value.get(literal, MISSING)
+                if vval is MISSING or (scanning and literal in used_value_keys):
+                    return NO_MATCH
+                value_matched, value_extracted = match_val(vval)
+                if not value_matched:
+                    return NO_MATCH
+                total_extracted += value_extracted
+                if scanning:
+                    used_value_keys.add(literal)
+                continue
+
+            for vkey, vval in value.items():
+                if vkey in used_value_keys:
+                    continue
+                key_matched, key_extracted = match_key(vkey)
+                if key_matched:
+                    value_matched, value_extracted = match_val(vval)
+                    if value_matched:
+                        total_extracted += key_extracted
+                        total_extracted += value_extracted
+                        used_value_keys.add(vkey)
+                        break
+            else:
+                return NO_MATCH
+        return True, total_extracted
+
+    return match
+
+
+@lru_cache(maxsize=None)
+def record_fields(cls):
+    """
+    field names of a dataclass or attrs class, None for the other classes
+    """
+    if is_dataclass(cls):
+        return tuple(field.name for field in fields(cls))
+    attributes = getattr(cls, "__attrs_attrs__", None)
+    if attributes is not None:
+        return tuple(attribute.name for attribute in attributes)
+    return None
+
+
+def is_record(pattern):
+    """
+    whether pattern is a dataclass or attrs instance
+    """
+    return not isinstance(pattern, type) and record_fields(type(pattern)) is not None
+
+
+def compile_dataclass(pattern, views=False):
+    cls = pattern.__class__
+    # => (getter, matcher), fields of `_` are extracted without being matched
+    matchers = []
+    for name in record_fields(cls):
+        try:
+            field_pattern = getattr(pattern, name)
+        except AttributeError:
+            continue
+        if field_pattern.__class__ is UnderscoreType:
+            matchers.append((attrgetter(name), None))
+        else:
+            matchers.append((attrgetter(name), compile_pattern(field_pattern, views)))
+    matchers = tuple(matchers)
+    otherwise = compile_callable(pattern) if callable(pattern) else None
+
+    def match(value):
+        if value.__class__ != cls:
+            return NO_MATCH if otherwise is None else otherwise(value)
+
+        total_extracted = []
+        for getter, matcher in matchers:
+            try:
+                field_value = getter(value)
+            except AttributeError:
+                return NO_MATCH
+            if matcher is None:
+                total_extracted.append(field_value)
+                continue
+            matched, extracted = matcher(field_value)
+            if not matched:
+                return NO_MATCH
+            total_extracted += extracted
+        return True, total_extracted
+
+    return match
+
+
+def index_key(pattern):
+    """
+    describe which values could possibly match the pattern, None if any value could
+    """
+    if isinstance(pattern, XObject):
+        return None
+    elif isinstance(pattern, Pattern):
+        return pattern.index_key()
+    elif isinstance(pattern, dict):
+        return "instance", dict
+    elif pattern == _:
+        return None
+    elif is_record(pattern):
+        return None if callable(pattern) else ("class", pattern.__class__)
+    elif is_typing_stuff(pattern):
+        return None
+    elif isinstance(pattern, (int, float, str, bool, Enum)) or pattern is None:
+        try:
+            hash(pattern)
+        except TypeError:
+            return None
+        return "literal", type(pattern), pattern
+    elif isinstance(pattern, type):
+        # metaclasses may customize isinstance, only trust the plain ones
+        if type(pattern) in (type, ABCMeta):
+            return "instance", pattern
+        return None
+    elif isinstance(pattern, (list, tuple)):
+        split = split_tail(pattern)
+        if split is None:
+            return None
+        return "sequence", len(split[0]), split[1]
+
+    return None
+
+
+class DispatchIndex(object):
+    """
+    prune the arms of a table down to the ones that could match a value
+
+    Arms are indexed by the class of the value: literal arms are looked up in a
+    hash map, type arms are resolved once per class, and iterable arms are
+    bucketed by length. First-match-wins order is kept in every bucket.
+
+    Entries are built on the first value of a class, the least recently used
+    class is evicted past `cache_size` classes. A bucket is the tuple of its arms,
+    or `bucket(positions)` of the sorted positions of its arms.
+    """
+
+    def __init__(self, keys, arms, cache_size=256, bucket=None):
+        self.keys = tuple(keys)
+        self.arms = tuple(arms)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.bucket = bucket or self.pick_arms
+        self.buckets = {}
+        self.everything = self.pick(range(len(self.keys)))
+
+    def select(self, value):
+        cls = value.__class__
+        if cls is not type(value):
+            return self.everything
+
+        cache = self.cache
+        try:
+            static, entry = cache[cls]
+        except KeyError:
+            static, entry = cache[cls] = self.build(cls)
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(cls)
+
+        return entry if static else entry(value)
+
+    def pick_arms(self, positions):
+        return tuple(self.arms[position] for position in positions)
+
+    def pick(self, positions):
+        # buckets of the same arms are shared by the lengths and classes
+        positions = tuple(sorted(positions))
+        bucket = self.buckets.get(positions)
+        if bucket is None:
+            bucket = self.buckets[positions] = self.bucket(positions)
+        return bucket
+
+    def build(self, cls):
+        sized = issubclass(cls, (list, tuple, SequenceView))
+        common = []
+        literals = {}
+        sequences = []
+        for position, key in enumerate(self.keys):
+            if key is None:
+                common.append(position)
+            elif key[0] == "literal":
+                if key[1] is cls:
+                    literals.setdefault(key[2], []).append(position)
+            elif key[0] == "instance":
+                if self.is_subclass(cls, key[1]):
+                    common.append(position)
+            elif key[0] == "class":
+                if key[1] == cls:
+                    common.append(position)
+            elif key[0] == "sequence":
+                if sized:
+                    sequences.append((position, key[1], key[2]))
+                elif issubclass(cls, Iterable):
+                    common.append(position)
+
+        pick = self.pick
+        if literals:
+            by_value = {
+                literal: pick(common + positions)
+                for literal, positions in literals.items()
+            }
+            others = pick(common)
+            return False, lambda value: by_value.get(value, others)
+
+        if sequences:
+            bound = max(size for _position, size, _has_tail in sequences) + 1
+            buckets = tuple(
+                pick(
+                    common
+                    + [
+                        position
+                        for position, size, has_tail in sequences
+                        if length == size or (has_tail and length >= size)
+                    ]
+                )
+                for length in range(bound + 1)
+            )
+            return False, lambda value: buckets[min(len(value), bound)]
+
+        return True, pick(common)
+
+    @staticmethod
+    def is_subclass(cls, pattern):
+        try:
+            return issubclass(cls, pattern)
+        except TypeError:
+            return True
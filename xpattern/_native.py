@@ -0,0 +1,214 @@
+import math
+import sys
+
+from abc import ABCMeta
+
+from pampy import HEAD
+from pampy import _
+from pampy.helpers import UnderscoreType
+
+from ._compiler import compile_pattern
+from ._compiler import split_tail
+from ._patterns import ClassPattern
+from ._xobject import XObject
+
+
+# `match` statements are only available since python 3.10
+NATIVE = sys.version_info >= (3, 10)
+
+
+class NativeSource(object):
+    """
+    render the patterns of a table into the cases of a `match` statement
+
+    Sub-patterns which have no equivalent native pattern are captured and checked
+    by their compiled matcher in the guard of the case, so matching and extracted
+    arguments are the same as the compiled table.
+    """
+
+    def __init__(self):
+        self.constants = []
+        self.counter = 0
+
+    def constant(self, value):
+        self.constants.append(value)
+        return "_c%d" % (len(self.constants) - 1)
+
+    def fresh(self, prefix):
+        self.counter += 1
+        return "%s%d" % (prefix, self.counter)
+
+    def case(self, pattern, position):
+        guards = []
+        if is_native_literal(pattern):
+            # literals are compared by the match statement, only their type is checked
+            source, extracted = repr(pattern), []
+            guards.append("type(value) is " + self.constant(type(pattern)))
+        else:
+            source, extracted = self.pattern(pattern, guards, top=True)
+        if not guards and extracted == [source]:
+            # a bare capture pattern can only be the last case
+            source = "object() as " + source
+        return (
+            "            case {0}{1}:\n"
+            "                return {2}, [{3}]\n".format(
+                source,
+                " if " + " and ".join(guards) if guards else "",
+                position,
+                ", ".join(extracted),
+            )
+        )
+
+    def pattern(self, pattern, guards, top=False):
+        """
+        render pattern, returns `(source, extracted)`, guards are appended to `guards`
+        """
+        if isinstance(pattern, XObject):
+            name = self.fresh("_g")
+            guards.append(
+                "{0}({1})[0]".format(self.constant(compile_pattern(pattern)), name)
+            )
+            return name, []
+        elif pattern.__class__ is UnderscoreType:
+            name = self.fresh("_a")
+            return name, [name]
+        elif isinstance(pattern, ClassPattern):
+            return self.class_pattern(pattern, guards)
+        elif pattern is None or pattern is True or pattern is False:
+            return repr(pattern), []
+        elif is_native_literal(pattern):
+            name = self.fresh("_l")
+            guards.append("type({0}) is {1}".format(name, self.constant(type(pattern))))
+            return "{0!r} as {1}".format(pattern, name), []
+        elif type(pattern) in (int, float, str):
+            name = self.fresh("_l")
+            guards.append(
+                "type({0}) is {1} and {0} == {2}".format(
+                    name, self.constant(type(pattern)), self.constant(pattern)
+                )
+            )
+            return name, []
+        elif isinstance(pattern, type) and type(pattern) in (type, ABCMeta):
+            name = self.fresh("_a")
+            return "{0}() as {1}".format(self.constant(pattern), name), [name]
+        elif type(pattern) is dict and all(type(key) is str for key in pattern):
+            return self.mapping_pattern(pattern, guards)
+        elif top and isinstance(pattern, (list, tuple)):
+            # nested values of other iterables are matched as lists by the compiled
+            # matchers, only top level values are sure to be lists or tuples
+            split = split_tail(pattern)
+            if split is not None:
+                return self.sequence_pattern(split[0], split[1], guards)
+
+        name = self.fresh("_g")
+        result = self.fresh("_r")
+        guards.append(
+            "({0} := {1}({2}))[0]".format(
+                result, self.constant(compile_pattern(pattern)), name
+            )
+        )
+        return name, ["*{0}[1]".format(result)]
+
+    def class_pattern(self, pattern, guards):
+        arguments = []
+        total_extracted = []
+        for name, attribute in pattern.attributes:
+            source, extracted = self.pattern(attribute, guards)
+            arguments.append(source if name is None else "%s=%s" % (name, source))
+            total_extracted += extracted
+        return (
+            "{0}({1})".format(self.constant(pattern.cls), ", ".join(arguments)),
+            total_extracted,
+        )
+
+    def mapping_pattern(self, pattern, guards):
+        # mapping patterns match any mapping, the dict check comes before the guards
+        # of the items like in the compiled matchers
+        name = self.fresh("_m")
+        guards.append("isinstance({0}, {1})".format(name, self.constant(dict)))
+        items = []
+        total_extracted = []
+        for key, value in pattern.items():
+            source, extracted = self.pattern(value, guards)
+            items.append("{0!r}: {1}".format(key, source))
+            total_extracted += extracted
+        return "{%s} as %s" % (", ".join(items), name), total_extracted
+
+    def sequence_pattern(self, patterns, has_tail, guards):
+        items = []
+        total_extracted = []
+        for pattern in patterns:
+            # HEAD can only be first, where it matches anything like `_`
+            source, extracted = self.pattern(_ if pattern is HEAD else pattern, guards)
+            items.append(source)
+            total_extracted += extracted
+        if has_tail:
+            name = self.fresh("_a")
+            items.append("*" + name)
+            total_extracted.append(name)
+
+        # only lists and tuples are dispatched to the match statement of a table
+        # with sequence patterns, see `Matchtable._find`
+        return "[%s]" % ", ".join(items), total_extracted
+
+
+def is_native_literal(pattern):
+    # literals whose repr is a literal pattern, nan and infinities are not
+    return type(pattern) in (int, str) or (
+        type(pattern) is float and math.isfinite(pattern)
+    )
+
+
+def compile_native(patterns, positions=None):
+    """
+    compile patterns into a `match` statement, `native(value) -> (position, args)`
+    or None if no pattern matches, None on python older than 3.10
+
+    `positions` are the positions returned for the patterns, their index by default.
+    """
+    if not NATIVE:
+        return None
+    if not patterns:
+        return no_match
+
+    source = NativeSource()
+    cases = "".join(
+        source.case(pattern, position)
+        for pattern, position in zip(
+            patterns, range(len(patterns)) if positions is None else positions
+        )
+    )
+    constants = source.constants
+    unpack = "".join("_c%d, " % i for i in range(len(constants)))
+    code = (
+        "def x_factory(constants):\n"
+        "    {0}\n"
+        "    def x_native(value):\n"
+        "        match value:\n"
+        "{1}"
+        "        return None\n"
+        "    return x_native\n"
+    ).format(unpack + "= constants" if constants else "pass", cases)
+
+    namespace = {}
+    exec(compile(code, "<caseof>", "exec"), namespace)
+    return namespace["x_factory"](constants)
+
+
+def no_match(value):
+    return None
+
+
+class NativeBuckets(object):
+    """
+    compile the buckets of a `DispatchIndex` into `match` statements, so the index
+    picks the arms which could match a value before the native match
+    """
+
+    def __init__(self, patterns):
+        self.patterns = tuple(patterns)
+
+    def __call__(self, positions):
+        return compile_native(
+            [self.patterns[position] for position in positions], positions
+        )
@@ -0,0 +1,468 @@
+import re
+
+from functools import lru_cache
+from itertools import chain
+from itertools import groupby
+from operator import attrgetter
+from struct import Struct
+from struct import error as struct_error
+
+from pampy import TAIL
+from pampy.helpers import UnderscoreType
+
+from ._compiler import NO_MATCH
+from ._compiler import Pattern
+from ._compiler import compile_literals
+from ._compiler import compile_pattern
+from ._compiler import compile_types
+from ._compiler import index_key
+from ._compiler import is_record
+from ._compiler import literal_prefix
+from ._compiler import record_fields
+from ._xobject import Candidates
+
+
+def flatten(cls, patterns):
+    """
+    splice the patterns of nested `cls` patterns, `(a | b) | c` is `a | b | c`
+    """
+    flat = []
+    for pattern in patterns:
+        if type(pattern) is cls:
+            flat.extend(pattern.patterns)
+        else:
+            flat.append(pattern)
+    return tuple(flat)
+
+
+def alternative_kind(pattern):
+    key = index_key(pattern)
+    if key is None:
+        return None
+    elif key[0] == "literal" and key[2] == key[2]:
+        # NaN never equals itself, but a set lookup would find the same object
+        return "literal"
+    elif key[0] == "instance" and isinstance(pattern, type):
+        return "type"
+    return None
+
+
+class AnyOf(Pattern):
+    """
+    match if any of the patterns matches
+    """
+
+    def __init__(self, *patterns):
+        self.patterns = flatten(AnyOf, patterns)
+
+    def __repr__(self):
+        return "({0})".format(" | ".join(map(repr, self.patterns)))
+
+    def __call__(self, value):
+        return self.matcher(value)[0]
+
+    def compile(self):
+        # runs of literals are merged into one hashed lookup, runs of types into
+        # one isinstance check, patterns are still tried in order
+        matchers = []
+        for kind, patterns in groupby(self.patterns, alternative_kind):
+            if kind == "literal":
+                matchers.append(compile_literals(patterns))
+            elif kind == "type":
+                matchers.append(compile_types(patterns))
+            else:
+                matchers.extend(compile_pattern(pattern) for pattern in patterns)
+        matchers = tuple(matchers)
+
+        def match(value):
+            for matcher in matchers:
+                if matcher(value)[0]:
+                    return True, [value]
+            return NO_MATCH
+
+        return match
+
+
+class AllOf(Pattern):
+    """
+    match if all of the patterns match
+    """
+
+    def __init__(self, *patterns):
+        self.patterns = flatten(AllOf, patterns)
+
+    def __repr__(self):
+        return "({0})".format(" & ".join(map(repr, self.patterns)))
+
+    def __call__(self, value):
+        return self.matcher(value)[0]
+
+    def compile(self):
+        matchers = tuple(compile_pattern(pattern) for pattern in self.patterns)
+
+        def match(value):
+            for matcher in matchers:
+                if not matcher(value)[0]:
+                    return NO_MATCH
+            return True, [value]
+
+        return match
+
+
+class Not(Pattern):
+    """
+    match if the pattern doesn't match
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def __repr__(self):
+        return "~{0!r}".format(self.pattern)
+
+    def __call__(self, value):
+        return self.matcher(value)[0]
+
+    def compile(self):
+        matcher = compile_pattern(self.pattern)
+
+        def match(value):
+            if matcher(value)[0]:
+                return NO_MATCH
+            return True, [value]
+
+        return match
+
+
+class OneOf(Pattern):
+    """
+    match if the value is one of the candidates, same as `value in candidates`
+    """
+
+    def __init__(self, *candidates):
+        self.candidates = Candidates(candidates)
+
+    def __repr__(self):
+        return "oneof{0!r}".format(self.candidates)
+
+    def __call__(self, value):
+        return value in self.candidates
+
+    def compile(self):
+        candidates = self.candidates
+
+        def match(value):
+            if value in candidates:
+                return True, [value]
+            return NO_MATCH
+
+        return match
+
+
+class Field(object):
+    """
+    fixed-width field of a bytes pattern, `format` is a `struct` format of one value,
+    the byte order is set by the bytes pattern
+    """
+
+    def __init__(self, format, name=None):
+        if not isinstance(format, str) or format[:1] in "@=<>!":
+            raise ValueError("{!r} is not a struct format of one value".format(format))
+        try:
+            packed = Struct(">" + format)
+            values = packed.unpack(bytes(packed.size))
+        except struct_error:
+            values = ()
+        if len(values) != 1:
+            raise ValueError("{!r} is not a struct format of one value".format(format))
+        self.format = format
+        self.name = name
+
+    def __repr__(self):
+        return self.name or "Field({!r})".format(self.format)
+
+
+U8 = Field("B", "U8")
+U16 = Field("H", "U16")
+U32 = Field("I", "U32")
+U64 = Field("Q", "U64")
+I8 = Field("b", "I8")
+I16 = Field("h", "I16")
+I32 = Field("i", "I32")
+I64 = Field("q", "I64")
+F32 = Field("f", "F32")
+F64 = Field("d", "F64")
+
+
+class BytesPattern(Pattern):
+    """
+    match bytes-like values against literal bytes and fixed-width fields
+
+    Fields are unpacked by one precompiled `struct.Struct` and extracted in order,
+    a trailing REST is extracted as a zero-copy memoryview of the rest.
+    """
+
+    def __init__(self, *parts, byteorder=">"):
+        if byteorder not in ("<", ">", "!", "="):
+            raise ValueError("byteorder must be one of '<', '>', '!' or '='")
+        for position, part in enumerate(parts):
+            if part is TAIL and position == len(parts) - 1:
+                continue
+            elif not isinstance(part, (bytes, bytearray, Field)):
+                raise TypeError("{!r} is not a bytes pattern part".format(part))
+        self.parts = parts
+        self.byteorder = byteorder
+
+    def __repr__(self):
+        return "bytes({0})".format(", ".join(map(repr, self.parts)))
+
+    def __call__(self, value):
+        return self.matcher(value)
+
+    def compile(self):
+        parts = list(self.parts)
+        has_rest = bool(parts) and parts[-1] is TAIL
+        if has_rest:
+            parts.pop()
+
+        formats = [self.byteorder]
+        # => (position in the unpacked values, literal)
+        literals = []
+        fields = []
+        for part in parts:
+            if isinstance(part, Field):
+                fields.append(len(formats) - 1)
+                formats.append(part.format)
+            else:
+                literals.append((len(formats) - 1, bytes(part)))
+                formats.append("%ds" % len(part))
+
+        layout = Struct("".join(formats))
+        unpack_from = layout.unpack_from
+        size = layout.size
+        fields = tuple(fields)
+        literals = tuple(literals)
+
+        def match(value):
+            if not isinstance(value, (bytes, bytearray, memoryview)):
+                return NO_MATCH
+            if isinstance(value, memoryview) and value.format != "B":
+                try:
+                    value = value.cast("B")
+                except TypeError:
+                    # non contiguous views can't be read as bytes
+                    return NO_MATCH
+
+            length = len(value)
+            if length != size and (not has_rest or length < size):
+                return NO_MATCH
+
+            unpacked = unpack_from(value)
+            for position, literal in literals:
+                if unpacked[position] != literal:
+                    return NO_MATCH
+
+            extracted = [unpacked[position] for position in fields]
+            if has_rest:
+                extracted.append(memoryview(value)[size:])
+            return True, extracted
+
+        return match
+
+
+class Keywords(dict):
+    """
+    extracted arguments passed to the action as keyword arguments
+    """
+
+
+@lru_cache(maxsize=1024)
+def cached_regex(spec, flags=0):
+    return re.compile(spec, flags)
+
+
+class RegexPattern(Pattern):
+    """
+    match str or bytes-like values with `regex.search`
+
+    Unnamed groups are extracted as positional arguments, named groups as keyword
+    arguments. Anchored regexes are prechecked with `str.startswith`.
+    """
+
+    def __init__(self, regex, flags=0):
+        if isinstance(regex, (str, bytes)):
+            regex = cached_regex(regex, flags)
+        elif flags:
+            raise ValueError("flags can't be set on a compiled regex")
+        self.regex = regex
+
+    def __repr__(self):
+        return "regex({!r})".format(self.regex.pattern)
+
+    def __call__(self, value):
+        return self.matcher(value)
+
+    def compile(self):
+        regex = self.regex
+        search = regex.search
+        # bytes regexes search any bytes-like value, only str regexes have a
+        # literal prefix to precheck
+        value_types = (
+            str if isinstance(regex.pattern, str) else (bytes, bytearray, memoryview)
+        )
+        prefix = literal_prefix(regex)
+        named = set(regex.groupindex.values())
+        positions = tuple(
+            position for position in range(1, regex.groups + 1) if position not in named
+        )
+
+        def match(value):
+            if not isinstance(value, value_types):
+                return NO_MATCH
+            if prefix is not None and not value.startswith(prefix):
+                return NO_MATCH
+
+            rematch = search(value)
+            if rematch is None:
+                return NO_MATCH
+            extracted = [rematch.group(position) for position in positions]
+            if named:
+                extracted.append(Keywords(rematch.groupdict()))
+            return True, extracted
+
+        return match
+
+
+# builtins matching the whole value with a single positional sub-pattern, PEP 634
+SELF_MATCHING = (
+    bool,
+    bytearray,
+    bytes,
+    dict,
+    float,
+    frozenset,
+    int,
+    list,
+    set,
+    str,
+    tuple,
+)
+
+
+class ClassPattern(Pattern):
+    """
+    match instances of cls whose attributes match the sub-patterns
+
+    Positional sub-patterns are matched with the attributes named by
+    `cls.__match_args__`, or by the fields of dataclasses and attrs classes.
+    """
+
+    def __init__(*args, **kw_patterns):
+        # `self` and `cls` are taken positionally, so attributes of those names
+        # can be given as keyword sub-patterns
+        if len(args) < 2:
+            raise TypeError("ClassPattern() missing the class to match")
+        self, cls, patterns = args[0], args[1], args[2:]
+        if not isinstance(cls, type):
+            raise TypeError("{!r} is not a class".format(cls))
+
+        if patterns and issubclass(cls, SELF_MATCHING) and len(patterns) == 1:
+            names = (None,)
+        else:
+            match_args = getattr(cls, "__match_args__", None)
+            if match_args is None:
+                match_args = record_fields(cls) or ()
+            if len(patterns) > len(match_args):
+                raise TypeError(
+                    "{0}() accepts {1} positional sub-patterns ({2} given)".format(
+                        cls.__name__, len(match_args), len(patterns)
+                    )
+                )
+            names = tuple(match_args[: len(patterns)])
+
+        for name in names:
+            if name in kw_patterns:
+                raise TypeError(
+                    "{0}() got multiple sub-patterns for attribute {1!r}".format(
+                        cls.__name__, name
+                    )
+                )
+
+        self.cls = cls
+        self.patterns = patterns
+        self.kw_patterns = kw_patterns
+        # => (attribute name or None for the value itself, pattern)
+        self.attributes = tuple(zip(names, patterns)) + tuple(kw_patterns.items())
+
+    def __repr__(self):
+        return "{0}({1})".format(
+            self.cls.__name__,
+            ", ".join(
+                [repr(pattern) for pattern in self.patterns]
+                + ["{0}={1!r}".format(k, v) for k, v in self.kw_patterns.items()]
+            ),
+        )
+
+    def __call__(self, value):
+        return self.matcher(value)
+
+    def index_key(self):
+        return index_key(self.cls)
+
+    def compile(self):
+        cls = self.cls
+        # => (getter, matcher), attributes of `_` are extracted without being matched
+        matchers = tuple(
+            (
+                None if name is None else attrgetter(name),
+                None
+                if pattern.__class__ is UnderscoreType
+                else compile_pattern(pattern),
+            )
+            for name, pattern in self.attributes
+        )
+
+        def match(value):
+            if not isinstance(value, cls):
+                return NO_MATCH
+
+            total_extracted = []
+            for getter, matcher in matchers:
+                if getter is None:
+                    attribute = value
+                else:
+                    try:
+                        attribute = getter(value)
+                    except AttributeError:
+                        return NO_MATCH
+                if matcher is None:
+                    total_extracted.append(attribute)
+                    continue
+                matched, extracted = matcher(attribute)
+                if not matched:
+                    return NO_MATCH
+                total_extracted += extracted
+            return True, total_extracted
+
+        return match
+
+
+def produces_keywords(pattern):
+    """
+    tell whether pattern can extract `Keywords`, only regex patterns with named
+    groups do, possibly nested in sequence, dict, dataclass or class patterns
+    """
+    if isinstance(pattern, RegexPattern):
+        return bool(pattern.regex.groupindex)
+    elif isinstance(pattern, ClassPattern):
+        return any(produces_keywords(sub) for _name, sub in pattern.attributes)
+    elif isinstance(pattern, dict):
+        return any(map(produces_keywords, chain(pattern, pattern.values())))
+    elif isinstance(pattern, (list, tuple)):
+        return any(map(produces_keywords, pattern))
+    elif is_record(pattern):
+        return any(
+            produces_keywords(getattr(pattern, name, None))
+            for name in record_fields(pattern.__class__)
+        )
+    return False
@@ -0,0 +1,224 @@
+from pampy import _
+
+from ._xobject import Candidates
+from ._xobject import XObject
+from ._xobject import set_name
+
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+
+def reflected(ufunc):
+    return lambda x, other: ufunc(other, x)
+
+
+# op => func(array, operand) built on numpy ufuncs
+VECTOR_OPERATIONS = {}
+
+if np is not None:
+    VECTOR_OPERATIONS.update(
+        {
+            "pos": lambda x, operand: np.positive(x),
+            "neg": lambda x, operand: np.negative(x),
+            "invert": lambda x, operand: np.invert(x),
+            "not": lambda x, operand: np.logical_not(x),
+            "getitem": lambda x, key: x[key],
+            "in": lambda x, candidates: vector_in(x, candidates),
+        }
+    )
+    for op, ufunc in [
+        ("add", np.add),
+        ("sub", np.subtract),
+        ("mul", np.multiply),
+        ("floordiv", np.floor_divide),
+        ("truediv", np.true_divide),
+        ("mod", np.mod),
+        ("pow", np.power),
+        ("lshift", np.left_shift),
+        ("rshift", np.right_shift),
+        ("and", np.bitwise_and),
+        ("xor", np.bitwise_xor),
+        ("or", np.bitwise_or),
+        ("lt", np.less),
+        ("le", np.less_equal),
+        ("gt", np.greater),
+        ("ge", np.greater_equal),
+        ("eq", np.equal),
+        ("ne", np.not_equal),
+    ]:
+        VECTOR_OPERATIONS[op] = ufunc
+        VECTOR_OPERATIONS["r" + op] = reflected(ufunc)
+
+
+# python type => numpy dtype kinds whose items are converted to that type
+DTYPE_KINDS = {bool: "b", int: "iu", float: "f", str: "U"}
+INSTANCE_DTYPE_KINDS = {bool: "b", int: "biu", float: "f", str: "U"}
+
+UNSUPPORTED = object()
+
+# candidate type => numpy dtype kinds whose items can equal a candidate
+CANDIDATE_KINDS = {bool: "biuf", int: "biuf", float: "biuf", str: "U"}
+
+
+def candidate_type(candidates):
+    """
+    type of the candidates of `X._in_(...)` which can be vectorized, TypeError if they
+    are not hashed scalars of one type, numpy would convert mixed ones to one dtype
+    """
+    types = (
+        set(map(type, candidates.hashed)) if isinstance(candidates, Candidates) else ()
+    )
+    if len(types) != 1 or candidates.others or next(iter(types)) not in CANDIDATE_KINDS:
+        raise TypeError("{0!r} can't be vectorized".format(candidates))
+    return next(iter(types))
+
+
+def vector_in(x, candidates):
+    if x.dtype == object:
+        # items computed as python objects are looked up like python does
+        return np.fromiter(map(candidates.__contains__, x), bool, len(x))
+    elif x.dtype.kind not in CANDIDATE_KINDS[candidate_type(candidates)]:
+        return np.zeros(x.shape, dtype=bool)
+    return np.isin(x, list(candidates.hashed))
+
+
+def is_array(values):
+    return np is not None and isinstance(values, np.ndarray)
+
+
+def vectorize(xobject):
+    """
+    convert XObject to a function applied on a whole numpy array at once
+
+    Operators are mapped to numpy ufuncs, `X._in_(...)` to `np.isin`, `X._not()` to
+    `np.logical_not` and `X["field"]` selects a field or a column.
+    """
+    if np is None:
+        raise ImportError("vectorize requires numpy")
+
+    steps = []
+    for op, operand in xobject._x_ops:
+        if op not in VECTOR_OPERATIONS or (
+            op == "getitem" and not isinstance(operand, str)
+        ):
+            raise TypeError("{0!r} can't be vectorized".format(xobject))
+        if op == "in":
+            candidate_type(operand)
+        if isinstance(operand, XObject):
+            steps.append((VECTOR_OPERATIONS[op], None, vectorize(operand)))
+        else:
+            steps.append((VECTOR_OPERATIONS[op], operand, None))
+    steps = tuple(steps)
+
+    def vectorized(values):
+        result = values
+        for func, operand, vectorized_operand in steps:
+            if vectorized_operand is not None:
+                operand = vectorized_operand(values)
+            result = func(result, operand)
+        return result
+
+    return set_name(xobject.__xobject_name__, vectorized)
+
+
+def try_vectorize(xobject):
+    try:
+        return vectorize(xobject)
+    except TypeError:
+        return None
+
+
+def vector_mask(pattern, array, exact):
+    """
+    evaluate pattern on every item of the array at once, UNSUPPORTED if it can't be,
+    XObjects are evaluated on `exact`, the same items as python objects or floats
+    """
+    if isinstance(pattern, XObject):
+        vectorized = try_vectorize(pattern) if pattern._x_ops else None
+        if vectorized is None:
+            return UNSUPPORTED
+        mask = vectorized(exact)
+        if not is_array(mask) or mask.dtype != bool or mask.shape != array.shape:
+            return UNSUPPORTED
+        return mask
+    elif isinstance(pattern, (dict, list, tuple)):
+        return UNSUPPORTED
+    elif pattern == _ or pattern is object:
+        return np.ones(array.shape, dtype=bool)
+    elif type(pattern) in DTYPE_KINDS:
+        if array.dtype.kind not in DTYPE_KINDS[type(pattern)]:
+            return np.zeros(array.shape, dtype=bool)
+        return array == pattern
+    elif isinstance(pattern, type) and pattern in INSTANCE_DTYPE_KINDS:
+        return np.full(array.shape, array.dtype.kind in INSTANCE_DTYPE_KINDS[pattern])
+    return UNSUPPORTED
+
+
+def vector_choice(action, exact):
+    if isinstance(action, XObject):
+        if not len(exact):
+            # nothing selected, the action is only checked to be vectorizable
+            return UNSUPPORTED if try_vectorize(action) is None else exact
+        vectorized = try_vectorize(action)
+        if vectorized is None:
+            return UNSUPPORTED
+        choice = vectorized(exact)
+        if not is_array(choice) or choice.shape != exact.shape:
+            return UNSUPPORTED
+        return choice.astype(object)
+    elif callable(action):
+        return UNSUPPORTED
+    return broadcast(action)
+
+
+def broadcast(value):
+    # a constant is assigned as one item, even a list or a tuple
+    item = np.empty(1, dtype=object)
+    item[0] = value
+    return item
+
+
+def vector_select(cases, array, unhandled):
+    """
+    dispatch every item of a 1-d array at once, UNSUPPORTED if some matchline can't
+    be vectorized
+
+    Like one dispatch per item, every matchline is only evaluated on the items left
+    by the previous ones, and results are python objects. Integers, booleans and
+    strings are computed as python objects, so they never overflow. Floats are
+    computed as float64 like python floats, and fall back to one dispatch per item
+    on any floating point error.
+    """
+    if array.ndim != 1 or array.dtype.kind not in "biufU":
+        return UNSUPPORTED
+    if array.dtype.kind == "f" and array.dtype != np.float64:
+        # smaller floats are items of python floats, wider ones are not
+        if array.dtype.itemsize > 8:
+            return UNSUPPORTED
+        array = array.astype(np.float64)
+
+    exact = array if array.dtype.kind == "f" else array.astype(object)
+    results = np.empty(array.shape, dtype=object)
+    rows = np.arange(len(array))
+    with np.errstate(all="raise"):
+        try:
+            for case in cases:
+                mask = vector_mask(case.pattern, array[rows], exact[rows])
+                if mask is UNSUPPORTED:
+                    return UNSUPPORTED
+                selected = rows[mask]
+                choice = vector_choice(case.action, exact[selected])
+                if choice is UNSUPPORTED:
+                    return UNSUPPORTED
+                if len(selected):
+                    results[selected] = choice
+                rows = rows[~mask]
+        except FloatingPointError:
+            return UNSUPPORTED
+
+    if len(rows):
+        results[rows] = broadcast(unhandled(array[rows[0]].item()))
+    return results
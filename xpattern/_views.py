@@ -0,0 +1,57 @@
+from collections.abc import Sequence
+
+
+class SequenceView(Sequence):
+    """
+    zero-copy view of `sequence[start:stop]`, slicing a view returns a view
+
+    A view reads the underlying sequence, so it sees the later changes of it.
+    """
+
+    __slots__ = ("sequence", "start", "stop")
+
+    def __init__(self, sequence, start=0, stop=None):
+        if isinstance(sequence, SequenceView):
+            # views of views read the underlying sequence directly, within the
+            # bounds of the parent view
+            bound = sequence.stop
+            start = min(sequence.start + start, bound)
+            stop = bound if stop is None else min(sequence.start + stop, bound)
+            sequence = sequence.sequence
+        size = len(sequence)
+        self.sequence = sequence
+        self.start = min(start, size)
+        self.stop = size if stop is None else max(self.start, min(stop, size))
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        positions = range(self.start, self.stop)[index]
+        if not isinstance(index, slice):
+            return self.sequence[positions]
+        elif positions.step == 1:
+            return SequenceView(self.sequence, positions.start, positions.stop)
+        return [self.sequence[position] for position in positions]
+
+    def __iter__(self):
+        return map(self.sequence.__getitem__, range(self.start, self.stop))
+
+    def __eq__(self, other):
+        if not isinstance(other, (SequenceView, list, tuple)):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return "SequenceView({!r})".format(list(self))
+
+
+def view(values, start):
+    """
+    zero-copy `values[start:]`, a memoryview for bytes-like values
+    """
+    if isinstance(values, (bytes, bytearray)):
+        return memoryview(values)[start:]
+    elif isinstance(values, (memoryview, SequenceView)):
+        return values[start:]
+    return SequenceView(values, start)
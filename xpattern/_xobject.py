@@ -1,3 +1,8 @@
+import keyword
+import math
+import operator
+
+from copy import deepcopy
 from functools import wraps
 from itertools import chain
 
@@ -27,8 +32,20 @@ def repr_args(*args, **kwargs):
 
 
 class Pipe(object):
-    def __init__(self, func=None):
-        self.func = func
+    """
+    left to right composition, `(pipe | f | g)(x)` is `g(f(x))`
+
+    Stages are kept in a flat tuple and run in one loop. A function returning an
+    XObject has it applied to the arguments of the pipe, stages of XObjects
+    resolve their own results, so that check is decided when the pipe is built.
+    """
+
+    def __init__(self, *stages, resolved=False):
+        # `Pipe(None)` is the empty pipe
+        stages = tuple(stage for stage in stages if stage is not None)
+        self.stages = stages
+        self.resolved = resolved
+        self.func = self.compose(stages)
 
     def __str__(self):
         return get_name(self.func)
@@ -36,244 +53,710 @@ class Pipe(object):
     __repr__ = __str__
 
     @staticmethod
-    def compose(first, second):
-        name = lambda: "{0} |> {1}".format(get_name(first), get_name(second))
+    def compose(stages):
+        if len(stages) < 2:
+            return stages[0] if stages else None
+
+        first, rest = stages[0], stages[1:]
+        name = lambda: " |> ".join(map(get_name, stages))
 
         def composite(*args, **kwargs):
-            return second(first(*args, **kwargs))
+            result = first(*args, **kwargs)
+            for stage in rest:
+                result = stage(result)
+            return result
 
         return set_name(name, composite)
 
-    @classmethod
-    def bind(cls, first, second):
-        # fmt: off
-        return cls(
-            first if second is None else
-            second if first is None else
-            cls.compose(first, second)
-        )
-        # fmt: on
-
     def __or__(self, next_func):
-        if isinstance(next_func, XObject):
+        if next_func is None or isinstance(next_func, Pipe) and not next_func.stages:
+            return self
+        elif isinstance(next_func, XObject):
             if next_func._x_func is None:
-                next_func = lambda x: x
-                set_name(lambda: "X", next_func)
-            else:
-                next_func = next_func._x_func
-
-        return self.bind(self.func, next_func)
+                # the bare X passes the previous result through, unresolved
+                identity = set_name(lambda: "X", lambda x: x)
+                return self.__class__(*self.stages, identity, resolved=self.resolved)
+            return self.__class__(*self.stages, next_func._x_func, resolved=True)
+        elif isinstance(next_func, Pipe):
+            # a pipe resolves its own result against its own arguments
+            if next_func.resolved:
+                return self.__class__(*(self.stages + next_func.stages), resolved=True)
+            return self.__class__(*self.stages, next_func, resolved=True)
+
+        return self.__class__(*self.stages, next_func)
 
     def __call__(self, *args, **kwargs):
         result = self.func(*args, **kwargs)
-        if isinstance(result, XObject):
-            return (pipe | result)(*args, **kwargs)
-        return result
+        if self.resolved or not isinstance(result, XObject):
+            return result
+        return (pipe | result)(*args, **kwargs)
 
 
 pipe = Pipe()
 
 
+class Candidates(object):
+    """
+    frozen candidates of a membership test, same as `value in candidates`
+
+    Hashable candidates are looked up in a frozenset, only the unhashable ones
+    are scanned, or all of them when the value is unhashable.
+    """
+
+    def __init__(self, candidates):
+        self.candidates = candidates
+        hashed = []
+        others = []
+        for candidate in candidates:
+            try:
+                hash(candidate)
+            except TypeError:
+                others.append(candidate)
+            else:
+                hashed.append(candidate)
+        self.hashed = frozenset(hashed)
+        self.others = tuple(others)
+
+    def __repr__(self):
+        return repr(self.candidates)
+
+    def __iter__(self):
+        return iter(self.candidates)
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def __contains__(self, value):
+        try:
+            if value in self.hashed:
+                return True
+        except TypeError:
+            return self.scan(value, self.candidates)
+        return self.scan(value, self.others)
+
+    @staticmethod
+    def scan(value, candidates):
+        return any(candidate is value or candidate == value for candidate in candidates)
+
+
+def x_resolve(xobject, x):
+    func = xobject._x_func
+    return x if func is None else func(x)
+
+
+def x_call(x, call):
+    wrapped, args, kwargs = call
+    return wrapped.__wrapped__(
+        *[x_resolve(arg, x) if isinstance(arg, XObject) else arg for arg in args],
+        **{
+            key: x_resolve(arg, x) if isinstance(arg, XObject) else arg
+            for key, arg in kwargs.items()
+        }
+    )
+
+
+def operand_key(operand):
+    # only scalars are compared by value, `1 == 1.0 == True` so the type is part
+    # of the key, and `0.0 == -0.0` so floats are keyed by their exact hex value;
+    # other operands are shared only when they are the same object
+    if type(operand) is float:
+        return float, operand.hex()
+    elif type(operand) in (str, int, bool, bytes, type(None)):
+        return type(operand), operand
+    return "id", id(operand)
+
+
+class XGraph(object):
+    """
+    share the common sub-expressions of XObjects
+
+    Nodes are interned by their operation chain, the arguments of xfunction calls
+    and the XObject operands of binary operators included, and every node is
+    evaluated at most once per input, on demand.
+    """
+
+    ROOT = 0
+
+    def __init__(self):
+        # node => (parent, func, operand, substituted), where a substituted operand
+        # is the node of an XObject operand. xfunction calls have no parent and hold
+        # `(args, kwargs)` of `(is_node, node or value)` arguments
+        self.nodes = [None]
+        self.keys = {}
+        self.shared = 0
+
+    def intern(self, key, node):
+        index = self.keys.get(key)
+        if index is None:
+            index = self.keys[key] = len(self.nodes)
+            self.nodes.append(node)
+        else:
+            self.shared += 1
+        return index
+
+    def add(self, xobject):
+        """
+        add XObject to the graph, returns the node of its value
+        """
+        node = self.ROOT
+        for op, operand in xobject._x_ops:
+            if op == "xcall" and node == self.ROOT:
+                node = self.add_call(operand)
+            elif op in SUBSTITUTED_OPERATIONS and isinstance(operand, XObject):
+                operand = self.add(operand)
+                node = self.intern(
+                    (node, op, "node", operand),
+                    (node, OPERATIONS[op][0], operand, True),
+                )
+            else:
+                node = self.intern(
+                    (node, op, operand_key(operand)),
+                    (node, OPERATIONS[op][0], operand, False),
+                )
+        return node
+
+    def add_call(self, call):
+        wrapped, args, kwargs = call
+        args = tuple(map(self.add_argument, args))
+        kwargs = tuple((key, self.add_argument(arg)) for key, arg in kwargs.items())
+        key = (
+            "xcall",
+            id(wrapped),
+            tuple(argument[:1] + (argument[2],) for argument in args),
+            tuple((key, argument[:1] + (argument[2],)) for key, argument in kwargs),
+        )
+        return self.intern(
+            key,
+            (
+                None,
+                wrapped.__wrapped__,
+                (
+                    tuple(argument[:2] for argument in args),
+                    tuple((key, argument[:2]) for key, argument in kwargs),
+                ),
+                False,
+            ),
+        )
+
+    def add_argument(self, arg):
+        # => (is_node, node or value, key)
+        if isinstance(arg, XObject):
+            node = self.add(arg)
+            return True, node, node
+        return False, arg, operand_key(arg)
+
+    def value(self, node, x, memo):
+        """
+        evaluate node, `memo` holds the evaluated nodes and starts as `{ROOT: x}`
+        """
+        pending = []
+        while node not in memo:
+            pending.append(node)
+            parent = self.nodes[node][0]
+            node = self.ROOT if parent is None else parent
+
+        for node in reversed(pending):
+            parent, func, operand, substituted = self.nodes[node]
+            if parent is None:
+                args, kwargs = operand
+                memo[node] = func(
+                    *[self.argument(argument, x, memo) for argument in args],
+                    **{
+                        key: self.argument(argument, x, memo)
+                        for key, argument in kwargs
+                    }
+                )
+            elif substituted:
+                memo[node] = func(memo[parent], self.result(operand, x, memo))
+            else:
+                memo[node] = func(memo[parent], operand)
+        return memo[node]
+
+    def result(self, node, x, memo):
+        """
+        evaluate node like `XObject._x_func`, an XObject result is resolved at x
+        """
+        value = self.value(node, x, memo)
+        return x_resolve(value, x) if isinstance(value, XObject) else value
+
+    def argument(self, argument, x, memo):
+        is_node, value = argument
+        return self.result(value, x, memo) if is_node else value
+
+
+def x_compile(ops):
+    """
+    compile XObject operations into one flat function
+    """
+    if any(op == "xcall" for op, _operand in ops):
+        graph = XGraph()
+        node = graph.add(XObject._x_from_ops(ops))
+
+        def x_func(x):
+            return graph.result(node, x, {XGraph.ROOT: x})
+
+        return x_func
+
+    steps = tuple(
+        (OPERATIONS[op][0], operand, x_operand(op, operand)) for op, operand in ops
+    )
+
+    if len(steps) == 1:
+        ((func, operand, resolve),) = steps
+
+        def x_func(x):
+            result = func(x, operand if resolve is None else resolve(x))
+            if isinstance(result, XObject):
+                return x_resolve(result, x)
+            return result
+
+    else:
+
+        def x_func(x):
+            result = x
+            for func, operand, resolve in steps:
+                result = func(result, operand if resolve is None else resolve(x))
+            if isinstance(result, XObject):
+                return x_resolve(result, x)
+            return result
+
+    return x_func
+
+
+def x_operand(op, operand):
+    """
+    XObject operands of binary operators are evaluated on the input before the
+    operator is applied, like `XGraph` and `x_codegen` do, returns that function
+    or None for other operands
+    """
+    if op not in SUBSTITUTED_OPERATIONS or not isinstance(operand, XObject):
+        return None
+    return operand._x_func or x_identity
+
+
+def x_identity(x):
+    return x
+
+
+def x_source(ops):
+    """
+    render XObject operations as a python expression of `x`
+
+    returns `(source, constants, dynamic)`, non-literal operands are referenced as
+    `_c<n>` names, `dynamic` tells whether the result may still be an XObject
+    """
+    constants = []
+    dynamic = False
+
+    def constant(value):
+        if type(value) in (str, bytes, bool, type(None)):
+            return repr(value)
+        elif type(value) is int or (type(value) is float and math.isfinite(value)):
+            # `-2 ** x` is `-(2 ** x)`, numbers are parenthesized
+            return "(%r)" % value
+        constants.append(value)
+        return "_c%d" % (len(constants) - 1)
+
+    def is_name(name):
+        return (
+            isinstance(name, str)
+            and name.isidentifier()
+            and not keyword.iskeyword(name)
+        )
+
+    def render(ops):
+        nonlocal dynamic
+
+        source = "x"
+        for op, operand in ops:
+            if op == "getattr":
+                if is_name(operand):
+                    source = "{0}.{1}".format(source, operand)
+                else:
+                    source = "getattr({0}, {1})".format(source, constant(operand))
+            elif op == "call":
+                dynamic = True
+                args, kwargs = operand
+                arguments = [constant(arg) for arg in args]
+                if all(map(is_name, kwargs)):
+                    arguments += [
+                        "{0}={1}".format(key, constant(value))
+                        for key, value in kwargs.items()
+                    ]
+                elif kwargs:
+                    arguments.append("**" + constant(kwargs))
+                source = "{0}({1})".format(source, ", ".join(arguments))
+            elif op == "xcall":
+                dynamic = True
+                source = "{0}({1}, {2})".format(
+                    constant(OPERATIONS[op][0]), source, constant(operand)
+                )
+            else:
+                if op == "apply":
+                    dynamic = True
+                if op in SUBSTITUTED_OPERATIONS and isinstance(operand, XObject):
+                    operand_source = render(operand._x_ops)
+                else:
+                    operand_source = constant(operand)
+                source = SOURCE_TEMPLATES[op].format(x=source, operand=operand_source)
+        return source
+
+    return render(ops), constants, dynamic
+
+
+def x_codegen(ops):
+    """
+    compile XObject operations into generated python code, XObject operands are
+    evaluated on the input
+    """
+    source, constants, dynamic = x_source(ops)
+    if dynamic:
+        body = (
+            "result = {0}\n"
+            "        if isinstance(result, XObject):\n"
+            "            return x_resolve(result, x)\n"
+            "        return result"
+        ).format(source)
+    else:
+        body = "return {0}".format(source)
+
+    unpack = "".join("_c%d, " % i for i in range(len(constants)))
+    code = (
+        "def x_factory(constants):\n"
+        "    {0}\n"
+        "    def x_generated(x):\n"
+        "        {1}\n"
+        "    return x_generated\n"
+    ).format(unpack + "= constants" if constants else "pass", body)
+
+    namespace = {"XObject": XObject, "x_resolve": x_resolve}
+    exec(compile(code, "<xobject>", "exec"), namespace)
+    return namespace["x_factory"](constants)
+
+
+def x_restore(ops, codegen):
+    return XObject._x_from_ops(ops, codegen)
+
+
 class XObject(object):
     def __init__(self, func=None):
-        self._x_func = func
-        set_name(lambda: get_name(func) if func else "X", self)
+        self._x_ops = () if func is None else (("apply", func),)
+        self._x_codegen = False
+        self._x_compiled = None
 
-    def _x_bind(self, name, func):
-        set_name(name, func)
-        return XObject((self._x_func | func) if self._x_func else (pipe | func))
+    @classmethod
+    def _x_from_ops(cls, ops, codegen=False):
+        xobject = cls()
+        xobject._x_ops = ops
+        xobject._x_codegen = codegen
+        return xobject
+
+    @property
+    def _x_func(self):
+        if not self._x_ops:
+            return None
+        if self._x_compiled is None:
+            compiler = x_codegen if self._x_codegen else x_compile
+            self._x_compiled = set_name(self.__xobject_name__, compiler(self._x_ops))
+        return self._x_compiled
+
+    def _x_bind(self, op, operand=None):
+        return self._x_from_ops(self._x_ops + ((op, operand),), self._x_codegen)
+
+    def __reduce__(self):
+        return x_restore, (self._x_ops, self._x_codegen)
+
+    def __copy__(self):
+        return x_restore(self._x_ops, self._x_codegen)
+
+    def __deepcopy__(self, memo):
+        return x_restore(deepcopy(self._x_ops, memo), self._x_codegen)
+
+    def __xobject_name__(self):
+        if not self._x_ops:
+            return "X"
+        return " |> ".join(OPERATIONS[op][1](operand) for op, operand in self._x_ops)
 
     def __repr__(self):
-        return get_name(self)
+        return self.__xobject_name__()
 
     def __pos__(self):
-        return self._x_bind(lambda: "+X", lambda x: +x)
+        return self._x_bind("pos")
 
     def __neg__(self):
-        return self._x_bind(lambda: "-X", lambda x: -x)
+        return self._x_bind("neg")
 
     def __invert__(self):
-        return self._x_bind(lambda: "~X", lambda x: ~x)
+        return self._x_bind("invert")
 
     def __add__(self, other):
-        return self._x_bind(lambda: "X + {0!r}".format(other), lambda x: x + other)
+        return self._x_bind("add", other)
 
     def __sub__(self, other):
-        return self._x_bind(lambda: "X - {0!r}".format(other), lambda x: x - other)
+        return self._x_bind("sub", other)
 
     def __mul__(self, other):
-        return self._x_bind(lambda: "X * {0!r}".format(other), lambda x: x * other)
+        return self._x_bind("mul", other)
 
     def __floordiv__(self, other):
-        return self._x_bind(lambda: "X // {0!r}".format(other), lambda x: x // other)
+        return self._x_bind("floordiv", other)
 
     def __truediv__(self, other):
-        return self._x_bind(lambda: "X / {0!r}".format(other), lambda x: x / other)
+        return self._x_bind("truediv", other)
 
     def __mod__(self, other):
-        return self._x_bind(lambda: "X % {0!r}".format(other), lambda x: x % other)
+        return self._x_bind("mod", other)
 
     def __pow__(self, other):
-        return self._x_bind(lambda: "X ** {0!r}".format(other), lambda x: x**other)
+        return self._x_bind("pow", other)
 
     def __lshift__(self, other):
-        return self._x_bind(lambda: "X << {0!r}".format(other), lambda x: x << other)
+        return self._x_bind("lshift", other)
 
     def __rshift__(self, other):
-        return self._x_bind(lambda: "X >> {0!r}".format(other), lambda x: x >> other)
+        return self._x_bind("rshift", other)
 
     def __and__(self, other):
-        return self._x_bind(lambda: "X & {0!r}".format(other), lambda x: x & other)
+        return self._x_bind("and", other)
 
     def __xor__(self, other):
-        return self._x_bind(lambda: "X ^ {0!r}".format(other), lambda x: x ^ other)
+        return self._x_bind("xor", other)
 
     def __or__(self, other):
-        return self._x_bind(lambda: "X | {0!r}".format(other), lambda x: x | other)
+        return self._x_bind("or", other)
 
     def __matmul__(self, other):
-        return self._x_bind(lambda: "X @ {0!r}".format(other), lambda x: x @ other)
+        return self._x_bind("matmul", other)
 
     def __lt__(self, other):
-        return self._x_bind(lambda: "X < {0!r}".format(other), lambda x: x < other)
+        return self._x_bind("lt", other)
 
     def __le__(self, other):
-        return self._x_bind(lambda: "X <= {0!r}".format(other), lambda x: x <= other)
+        return self._x_bind("le", other)
 
     def __gt__(self, other):
-        return self._x_bind(lambda: "X > {0!r}".format(other), lambda x: x > other)
+        return self._x_bind("gt", other)
 
     def __ge__(self, other):
-        return self._x_bind(lambda: "X >= {0!r}".format(other), lambda x: x >= other)
+        return self._x_bind("ge", other)
 
     def __eq__(self, other):
-        return self._x_bind(lambda: "X == {0!r}".format(other), lambda x: x == other)
+        return self._x_bind("eq", other)
 
     def __ne__(self, other):
-        return self._x_bind(lambda: "X != {0!r}".format(other), lambda x: x != other)
+        return self._x_bind("ne", other)
 
     def __radd__(self, other):
-        return self._x_bind(lambda: "{0!r} + X".format(other), lambda x: other + x)
+        return self._x_bind("radd", other)
 
     def __rsub__(self, other):
-        return self._x_bind(lambda: "{0!r} - X".format(other), lambda x: other - x)
+        return self._x_bind("rsub", other)
 
     def __rmul__(self, other):
-        return self._x_bind(lambda: "{0!r} * X".format(other), lambda x: other * x)
+        return self._x_bind("rmul", other)
 
     def __rfloordiv__(self, other):
-        return self._x_bind(lambda: "{0!r} // X".format(other), lambda x: other // x)
+        return self._x_bind("rfloordiv", other)
 
     def __rtruediv__(self, other):
-        return self._x_bind(lambda: "{0!r} / X".format(other), lambda x: other / x)
+        return self._x_bind("rtruediv", other)
 
     def __rmod__(self, other):
-        return self._x_bind(lambda: "{0!r} % X".format(other), lambda x: other % x)
+        return self._x_bind("rmod", other)
 
     def __rpow__(self, other):
-        return self._x_bind(lambda: "{0!r} ** X".format(other), lambda x: other**x)
+        return self._x_bind("rpow", other)
 
     def __rlshift__(self, other):
-        return self._x_bind(lambda: "{0!r} << X".format(other), lambda x: other << x)
+        return self._x_bind("rlshift", other)
 
     def __rrshift__(self, other):
-        return self._x_bind(lambda: "{0!r} >> X".format(other), lambda x: other >> x)
+        return self._x_bind("rrshift", other)
 
     def __rand__(self, other):
-        return self._x_bind(lambda: "{0!r} & X".format(other), lambda x: other & x)
+        return self._x_bind("rand", other)
 
     def __rxor__(self, other):
-        return self._x_bind(lambda: "{0!r} ^ X".format(other), lambda x: other ^ x)
+        return self._x_bind("rxor", other)
 
     def __ror__(self, other):
-        return self._x_bind(lambda: "{0!r} | X".format(other), lambda x: other | x)
+        return self._x_bind("ror", other)
 
     def __rmatmul__(self, other):
-        return self._x_bind(lambda: "{0!r} @ X".format(other), lambda x: other @ x)
+        return self._x_bind("rmatmul", other)
 
     def __rlt__(self, other):
-        return self._x_bind(lambda: "{0!r} < X".format(other), lambda x: other < x)
+        return self._x_bind("rlt", other)
 
     def __rle__(self, other):
-        return self._x_bind(lambda: "{0!r} <= X".format(other), lambda x: other <= X)
+        return self._x_bind("rle", other)
 
     def __rgt__(self, other):
-        return self._x_bind(lambda: "{0!r} > X".format(other), lambda x: other > x)
+        return self._x_bind("rgt", other)
 
     def __rge__(self, other):
-        return self._x_bind(lambda: "{0!r} >= X".format(other), lambda x: other >= X)
+        return self._x_bind("rge", other)
 
     def __req__(self, other):
-        return self._x_bind(lambda: "{0!r} == X".format(other), lambda x: other == x)
+        return self._x_bind("req", other)
 
     def __rne__(self, other):
-        return self._x_bind(lambda: "{0!r} != X".format(other), lambda x: other != x)
+        return self._x_bind("rne", other)
 
     def __concat__(self, other):
-        return self._x_bind(lambda: "X + {0!r}".format(other), lambda x: x + other)
+        return self._x_bind("add", other)
 
     def __getattr__(self, name):
-        return self._x_bind(lambda: "X.{0}".format(name), lambda x: getattr(x, name))
+        return self._x_bind("getattr", name)
 
     def __getitem__(self, item):
-        return self._x_bind(lambda: "X[{0!r}]".format(item), lambda x: x[item])
+        return self._x_bind("getitem", item)
 
     def _in_(self, iterable):
-        return self._x_bind(
-            lambda: "X in {0!r}".format(iterable), lambda x: x in iterable
-        )
+        if isinstance(iterable, (list, tuple)):
+            iterable = Candidates(iterable)
+        return self._x_bind("in", iterable)
 
     def _contains_(self, item):
-        return self._x_bind(lambda: "{0!r} in X".format(item), lambda x: item in x)
+        return self._x_bind("contains", item)
 
     def _is_(self, item):
-        return self._x_bind(lambda: "X is {0!r}".format(item), lambda x: x is item)
+        return self._x_bind("is", item)
 
     def _not(self):
-        return self._x_bind(lambda: "not X", lambda x: not x)
+        return self._x_bind("not")
 
     def __call__(self, *args, **kwargs):
-        name = lambda: "X(%s)" % repr_args(*args, **kwargs)
-        return self._x_bind(name, lambda x: x(*args, **kwargs))
+        return self._x_bind("call", (args, kwargs))
 
     def __hash__(self):
         return super(XObject, self).__hash__()
 
 
+def binary_operation(func, template):
+    return func, template.format
+
+
+def unary_operation(func, name):
+    return (lambda x, operand: func(x)), (lambda operand: name)
+
+
+# op => (func(x, operand), render(operand))
+OPERATIONS = {
+    "pos": unary_operation(operator.pos, "+X"),
+    "neg": unary_operation(operator.neg, "-X"),
+    "invert": unary_operation(operator.invert, "~X"),
+    "not": unary_operation(operator.not_, "not X"),
+    "add": binary_operation(operator.add, "X + {0!r}"),
+    "sub": binary_operation(operator.sub, "X - {0!r}"),
+    "mul": binary_operation(operator.mul, "X * {0!r}"),
+    "floordiv": binary_operation(operator.floordiv, "X // {0!r}"),
+    "truediv": binary_operation(operator.truediv, "X / {0!r}"),
+    "mod": binary_operation(operator.mod, "X % {0!r}"),
+    "pow": binary_operation(operator.pow, "X ** {0!r}"),
+    "lshift": binary_operation(operator.lshift, "X << {0!r}"),
+    "rshift": binary_operation(operator.rshift, "X >> {0!r}"),
+    "and": binary_operation(operator.and_, "X & {0!r}"),
+    "xor": binary_operation(operator.xor, "X ^ {0!r}"),
+    "or": binary_operation(operator.or_, "X | {0!r}"),
+    "matmul": binary_operation(operator.matmul, "X @ {0!r}"),
+    "lt": binary_operation(operator.lt, "X < {0!r}"),
+    "le": binary_operation(operator.le, "X <= {0!r}"),
+    "gt": binary_operation(operator.gt, "X > {0!r}"),
+    "ge": binary_operation(operator.ge, "X >= {0!r}"),
+    "eq": binary_operation(operator.eq, "X == {0!r}"),
+    "ne": binary_operation(operator.ne, "X != {0!r}"),
+    "radd": binary_operation(lambda x, other: other + x, "{0!r} + X"),
+    "rsub": binary_operation(lambda x, other: other - x, "{0!r} - X"),
+    "rmul": binary_operation(lambda x, other: other * x, "{0!r} * X"),
+    "rfloordiv": binary_operation(lambda x, other: other // x, "{0!r} // X"),
+    "rtruediv": binary_operation(lambda x, other: other / x, "{0!r} / X"),
+    "rmod": binary_operation(lambda x, other: other % x, "{0!r} % X"),
+    "rpow": binary_operation(lambda x, other: other**x, "{0!r} ** X"),
+    "rlshift": binary_operation(lambda x, other: other << x, "{0!r} << X"),
+    "rrshift": binary_operation(lambda x, other: other >> x, "{0!r} >> X"),
+    "rand": binary_operation(lambda x, other: other & x, "{0!r} & X"),
+    "rxor": binary_operation(lambda x, other: other ^ x, "{0!r} ^ X"),
+    "ror": binary_operation(lambda x, other: other | x, "{0!r} | X"),
+    "rmatmul": binary_operation(lambda x, other: other @ x, "{0!r} @ X"),
+    "rlt": binary_operation(lambda x, other: other < x, "{0!r} < X"),
+    "rle": binary_operation(lambda x, other: other <= x, "{0!r} <= X"),
+    "rgt": binary_operation(lambda x, other: other > x, "{0!r} > X"),
+    "rge": binary_operation(lambda x, other: other >= x, "{0!r} >= X"),
+    "req": binary_operation(lambda x, other: other == x, "{0!r} == X"),
+    "rne": binary_operation(lambda x, other: other != x, "{0!r} != X"),
+    "getattr": binary_operation(getattr, "X.{0}"),
+    "getitem": binary_operation(operator.getitem, "X[{0!r}]"),
+    "in": binary_operation(lambda x, iterable: x in iterable, "X in {0!r}"),
+    "contains": binary_operation(operator.contains, "{0!r} in X"),
+    "is": binary_operation(operator.is_, "X is {0!r}"),
+    "call": (
+        lambda x, arguments: x(*arguments[0], **arguments[1]),
+        lambda arguments: "X(%s)" % repr_args(*arguments[0], **arguments[1]),
+    ),
+    "apply": (lambda x, func: func(x), get_name),
+    "xcall": (x_call, lambda call: "xfunction"),
+}
+
+
+SOURCE_TEMPLATES = {
+    "pos": "(+{x})",
+    "neg": "(-{x})",
+    "invert": "(~{x})",
+    "not": "(not {x})",
+    "getitem": "{x}[{operand}]",
+    "in": "({x} in {operand})",
+    "contains": "({operand} in {x})",
+    "is": "({x} is {operand})",
+    "apply": "{operand}({x})",
+}
+
+# binary operators dispatch to XObject operands, which then evaluate on the input
+SUBSTITUTED_OPERATIONS = set()
+
+for op, symbol in [
+    ("add", "+"),
+    ("sub", "-"),
+    ("mul", "*"),
+    ("floordiv", "//"),
+    ("truediv", "/"),
+    ("mod", "%"),
+    ("pow", "**"),
+    ("lshift", "<<"),
+    ("rshift", ">>"),
+    ("and", "&"),
+    ("xor", "^"),
+    ("or", "|"),
+    ("matmul", "@"),
+    ("lt", "<"),
+    ("le", "<="),
+    ("gt", ">"),
+    ("ge", ">="),
+    ("eq", "=="),
+    ("ne", "!="),
+]:
+    SOURCE_TEMPLATES[op] = "({x} %s {operand})" % symbol
+    SOURCE_TEMPLATES["r" + op] = "({operand} %s {x})" % symbol
+    SUBSTITUTED_OPERATIONS.update([op, "r" + op])
+
+
 X = XObject()
 
 
+def xcompile(xobject):
+    """
+    opt-in code generation, compile XObject into a native python function
+    """
+    return XObject._x_from_ops(xobject._x_ops, codegen=True)
+
+
 def xfunction(func):
     """
     convert function to XObject
     """
 
-    def cal_recursion_xobject(arg, x):
-        if not isinstance(arg, XObject):
-            return arg
-        arg = (pipe | arg)(x)
-        if not isinstance(arg, XObject):
-            return arg
-        else:
-            return cal_recursion_xobject(arg, x)
-
     @wraps(func)
     def wrapped(*args, **kwargs):
-        def subwrapped(x):
-            new_args = []
-            new_kwargs = {}
-            for arg in args:
-                if isinstance(arg, XObject):
-                    arg = cal_recursion_xobject(arg, x)
-                new_args.append(arg)
-
-            for key, keyarg in kwargs.items():
-                if isinstance(keyarg, XObject):
-                    keyarg = cal_recursion_xobject(keyarg, x)
-                new_kwargs[key] = keyarg
-            return func(*args, **kwargs)
-
-        subwrapped.__name__ = "xfunction"
-        return XObject(pipe | subwrapped)
+        return XObject._x_from_ops((("xcall", (wrapped, args, kwargs)),))
 
     return wrapped
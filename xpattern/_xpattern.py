@@ -1,15 +1,52 @@
+import asyncio
+import hashlib
+import os
+import pickle
+
+from collections import OrderedDict
+from collections import deque
+from collections.abc import Collection
 from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from inspect import isawaitable
+from itertools import islice
 
 from pampy import MatchError
 from pampy import _
 from pampy.helpers import BoxedArgs
 from pampy.helpers import UnderscoreType
-from pampy.helpers import is_dataclass
 from pampy.pampy import NoDefault
 from pampy.pampy import match_value as pampy_match_value
 from pampy.pampy import run as pampy_run
 
+from ._compiler import DispatchIndex
+from ._compiler import Replay
+from ._compiler import compile_async_pattern
+from ._compiler import compile_guard
+from ._compiler import compile_pattern
+from ._compiler import index_key
+from ._compiler import is_record
+from ._compiler import record_fields
+from ._compiler import share_guards
+from ._native import NATIVE
+from ._native import NativeBuckets
+from ._native import compile_native
+from ._patterns import AllOf
+from ._patterns import AnyOf
+from ._patterns import BytesPattern
+from ._patterns import ClassPattern
+from ._patterns import Keywords
+from ._patterns import Not
+from ._patterns import OneOf
+from ._patterns import RegexPattern
+from ._patterns import produces_keywords
+from ._vector import UNSUPPORTED
+from ._vector import is_array
+from ._vector import np
+from ._vector import vector_select
 from ._xobject import Pipe
+from ._xobject import XGraph
 from ._xobject import XObject
 from ._xobject import pipe
 
@@ -22,7 +59,14 @@ class Matcher(object):
     def __init__(self, pattern=None):
         self.pattern = pattern
 
-    def __call__(self, pattern, *external_patterns):
+    def __call__(*args, **kw_patterns):
+        # the pattern is taken positionally, so keyword sub-patterns can be named
+        # `self` or `pattern`
+        if len(args) < 2:
+            raise TypeError("m() missing the pattern to match")
+        self, pattern, external_patterns = args[0], args[1], args[2:]
+        if kw_patterns:
+            return self.cls(pattern, *external_patterns, **kw_patterns)
         if external_patterns:
             pattern = [pattern] + list(external_patterns)
 
@@ -34,35 +78,76 @@ class Matcher(object):
     def __getitem__(self, pattern):
         return Matcher(pattern)
 
-    def __or__(self, other_matcher):
-        def new_pattern(value):
-            return (
-                match_value(self.pattern, value)[0]
-                or match_value(other_matcher.pattern, value)[0]
+    def cls(*args, **kw_patterns):
+        """
+        match instances of cls, sub-patterns are matched with their attributes,
+        positional ones by `cls.__match_args__`
+        """
+        if len(args) < 2:
+            raise TypeError("m.cls() missing the class to match")
+        cls, patterns = args[1], args[2:]
+        return Matcher(
+            ClassPattern(
+                cls,
+                *map(unwrap, patterns),
+                **{name: unwrap(pattern) for name, pattern in kw_patterns.items()},
             )
+        )
 
-        return Matcher(new_pattern)
+    def oneof(self, *candidates):
+        """
+        match values in candidates, hashable candidates are looked up in a frozenset
+        """
+        return Matcher(OneOf(*candidates))
+
+    def bytes(self, *parts, byteorder=">"):
+        """
+        match bytes-like values against literal bytes and fields like `U16`,
+        a trailing REST is bound as a memoryview
+        """
+        return Matcher(BytesPattern(*parts, byteorder=byteorder))
+
+    def regex(self, regex, flags=0):
+        """
+        match str or bytes-like values with a regex, compiled once, named groups are
+        passed to the action as keyword arguments
+        """
+        return Matcher(RegexPattern(regex, flags))
 
-    def __and__(self, other_matcher):
-        def new_pattern(value):
-            return (
-                match_value(self.pattern, value)[0]
-                and match_value(other_matcher.pattern, value)[0]
-            )
+    def __or__(self, other_matcher):
+        return Matcher(AnyOf(self.pattern, other_matcher.pattern))
 
-        return Matcher(new_pattern)
+    def __and__(self, other_matcher):
+        return Matcher(AllOf(self.pattern, other_matcher.pattern))
 
     def __invert__(self):
-        def new_pattern(value):
-            return match_value(self.pattern, value)[0] ^ True
+        return Matcher(Not(self.pattern))
 
-        return Matcher(new_pattern)
+
+def unwrap(pattern):
+    # sub-patterns can be matchers too, like `m(Line, a=m(Point, x=0))`
+    return pattern.pattern if isinstance(pattern, Matcher) else pattern
 
 
 class Matchline(object):
     def __init__(self, pattern, action):
         self.pattern = pattern
         self.action = action
+        self._matcher = None
+
+    @property
+    def matcher(self):
+        """
+        compiled matcher of the pattern, compiled once per matchline
+        """
+        if self._matcher is None:
+            self._matcher = compile_pattern(self.pattern)
+        return self._matcher
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_matcher"] = None
+        return state
 
     def __repr__(self):
         return "{!r} => {!r}".format(self.pattern, self.action)
@@ -79,13 +164,49 @@ def run(action, var):
     if isinstance(action, Pipe):
         if isinstance(var, BoxedArgs):
             var = var.get()
-        if isinstance(var, Iterable) and len(var) == 1:
+        if isinstance(var, Collection) and len(var) == 1:
             var = var[0]
         return action(var)
 
     return pampy_run(action, var)
 
 
+def run_with_keywords(action, var):
+    """
+    run action of a pattern which can extract `Keywords`, they are passed to the
+    action as keyword arguments
+    """
+    if var.__class__ is not list:
+        return run(action, var)
+
+    args = []
+    kwargs = {}
+    for item in var:
+        if item.__class__ is Keywords:
+            kwargs.update(item)
+        else:
+            args.append(item)
+
+    if isinstance(action, Pipe):
+        # pipes take one value, the keywords only if there is no positional one
+        return run(action, args or [kwargs])
+    elif callable(action):
+        return action(*args, **kwargs)
+    return action
+
+
+def boxed(value):
+    if isinstance(value, Replay):
+        value = value.replay()
+    return BoxedArgs(value)
+
+
+def prepare_action(action):
+    if isinstance(action, XObject):
+        return pipe | action
+    return action
+
+
 def match_value(pattern, value):
     if isinstance(pattern, XObject):
         return_value = pattern._x_func(value)
@@ -99,8 +220,8 @@ def match_value(pattern, value):
         return match_dict(pattern, value)
     elif pattern == _:
         return True, [value]
-    elif is_dataclass(pattern) and pattern.__class__ == value.__class__:
-        return match_dict(pattern.__dict__, value.__dict__)
+    elif is_record(pattern) and pattern.__class__ == value.__class__:
+        return match_fields(pattern, value)
 
     return pampy_match_value(pattern, value)
 
@@ -109,70 +230,107 @@ def match_dict(pattern, value):
     if not isinstance(value, dict) or not isinstance(pattern, dict):
         return False, []
 
+    # string keys can only match the same key, look them up directly,
+    # only the other pattern keys have to scan the value keys
+    scanning = not all(type(pkey) is str for pkey in pattern)
     total_extracted = []
-    still_usable_value_keys = set(value.keys())
-    still_usable_pattern_keys = set(pattern.keys())
+    used_value_keys = set()
     for pkey, pval in pattern.items():
-        if pkey not in still_usable_pattern_keys:
+        if type(pkey) is str:
+            vval = value.get(pkey, NoDefault)
+            if vval is NoDefault or pkey in used_value_keys:
+                return False, []
+            value_matched, value_extracted = match_value(pval, vval)
+            if not value_matched:
+                return False, []
+            total_extracted += value_extracted
+            if scanning:
+                used_value_keys.add(pkey)
             continue
-        matched_left_and_right = False
+
         for vkey, vval in value.items():
-            if vkey not in still_usable_value_keys:
-                continue
-            if pkey not in still_usable_pattern_keys:
+            if vkey in used_value_keys:
                 continue
             key_matched, key_extracted = match_value(pkey, vkey)
             if key_matched:
                 value_matched, value_extracted = match_value(pval, vval)
                 if value_matched:
                     total_extracted += key_extracted + value_extracted
-                    matched_left_and_right = True
-                    still_usable_pattern_keys.remove(pkey)
-                    still_usable_value_keys.remove(vkey)
+                    used_value_keys.add(vkey)
                     break
-        if not matched_left_and_right:
+        else:
+            return False, []
+    return True, total_extracted
+
+
+def match_fields(pattern, value):
+    total_extracted = []
+    for name in record_fields(pattern.__class__):
+        try:
+            field_pattern = getattr(pattern, name)
+        except AttributeError:
+            continue
+        try:
+            field_value = getattr(value, name)
+        except AttributeError:
+            return False, []
+        matched, extracted = match_value(field_pattern, field_value)
+        if not matched:
             return False, []
+        total_extracted += extracted
     return True, total_extracted
 
 
 class caseof(object):
-    def __init__(self, value, cases=None, default=NoDefault, strict=True):
+    def __init__(self, value, cases=None, default=NoDefault, strict=True, views=False):
         self.value = value
         self.cases = cases or []
         self.default = default
         self.strict = strict
+        self.views = views
 
     def __or__(self, other):
         if not isinstance(other, Matchline):
             raise CaseError("{!r} is not Matchline".format(other))
-        return caseof(
-            self.value, self.cases + [other], default=self.default, strict=self.strict
+        return self.__class__(
+            self.value,
+            self.cases + [other],
+            default=self.default,
+            strict=self.strict,
+            views=self.views,
         )
 
-    def __invert__(self):
-        if isinstance(self.value, XObject):
+    @classmethod
+    def compile(cls, *cases, default=NoDefault, strict=True, views=False, native=False):
+        return Matchtable(
+            cases, default=default, strict=strict, views=views, native=native
+        )
 
-            def wrapped(x, *args):
-                if args:
-                    x = [x] + list(args)
-                return ~caseof(
-                    x, cases=self.cases, default=self.default, strict=self.strict
-                )
+    def _table(self):
+        return Matchtable(
+            self.cases, default=self.default, strict=self.strict, views=self.views
+        )
 
-            return wrapped
+    def __invert__(self):
+        if isinstance(self.value, XObject):
+            return self._table()
+        elif isinstance(self.value, Iterator) or self.views:
+            # compiled sequence patterns only read the prefix of iterators,
+            # and bind TAIL as a view
+            return self._table()(self.value)
 
         patterns = []
         for case in self.cases:
             pattern, action = case.pattern, case.action
             patterns.append(pattern)
 
-            if isinstance(action, XObject):
-                action = pipe | action or (lambda x: x)
+            action = prepare_action(action)
 
-            matched_as_value, args = match_value(pattern, self.value)
+            matched_as_value, args = case.matcher(self.value)
             if matched_as_value:
                 lambda_args = args if len(args) > 0 else BoxedArgs(self.value)
-                return run(action, lambda_args)
+                runner = run_with_keywords if produces_keywords(pattern) else run
+                return runner(action, lambda_args)
 
         if self.default is NoDefault and self.strict is False:
             default = False
@@ -186,3 +344,438 @@ class caseof(object):
                 )
         else:
             return default
+
+
+class Matchtable(object):
+    """
+    frozen caseof table, built once and dispatched many times
+    """
+
+    def __init__(
+        self, cases, default=NoDefault, strict=True, views=False, native=False
+    ):
+        for case in cases:
+            if not isinstance(case, Matchline):
+                raise CaseError("{!r} is not Matchline".format(case))
+
+        self.cases = tuple(cases)
+        self.default = default
+        self.strict = strict
+        self.views = views
+        self.native = native
+        # XObject patterns sharing sub-expressions are evaluated through one graph,
+        # so each shared projection of a value is computed once per dispatch
+        self._graph, nodes = share_guards([case.pattern for case in self.cases])
+        self._arms = tuple(
+            (
+                compile_pattern(case.pattern, views)
+                if node is None
+                else compile_guard(case.pattern),
+                prepare_action(case.action),
+                node,
+                position,
+            )
+            for position, (case, node) in enumerate(zip(self.cases, nodes))
+        )
+        # only arms of regex patterns with named groups pass keyword arguments
+        self._runners = tuple(
+            run_with_keywords if produces_keywords(case.pattern) else run
+            for case in self.cases
+        )
+        self._keys = [index_key(case.pattern) for case in self.cases]
+        self._sequences = frozenset(
+            position
+            for position, key in enumerate(self._keys)
+            if key is not None and key[0] == "sequence"
+        )
+        self._instances = frozenset(
+            position
+            for position, key in enumerate(self._keys)
+            if key is not None and key[0] in ("instance", "class")
+        )
+        self._index = DispatchIndex(self._keys, self._arms) if any(self._keys) else None
+        # `match` statements over the arms the index picks, on python 3.10+, views
+        # are only bound by the compiled matchers and shared guards by the graph
+        self._native = self._native_index = None
+        if native and not views and self._graph is None and NATIVE:
+            patterns = [case.pattern for case in self.cases]
+            if self._index is None:
+                self._native = compile_native(patterns)
+            else:
+                self._native_index = DispatchIndex(
+                    self._keys, self._arms, bucket=NativeBuckets(patterns)
+                )
+        self._async_dispatch = None
+        self._payload = None
+        self._handles_all = _ in [case.pattern for case in self.cases]
+        if default is NoDefault and strict is False:
+            self._default = False
+        else:
+            self._default = default
+
+    def __repr__(self):
+        return "Matchtable({!r})".format(list(self.cases))
+
+    def __call__(self, value, *values):
+        if values:
+            value = [value] + list(values)
+        return self._dispatch(value)
+
+    def __reduce__(self):
+        return Matchtable, (
+            self.cases,
+            self.default,
+            self.strict,
+            self.views,
+            self.native,
+        )
+
+    def map(self, values, executor=None, chunksize=1024):
+        """
+        dispatch every value, 1-d numpy arrays are dispatched all at once
+        when every matchline can be vectorized
+
+        With an executor, values are dispatched by chunks in the executor, input order
+        is kept. The workers of `process_pool()` unpickle the table once when they
+        start, so only the chunks are sent. Any other `ProcessPoolExecutor` is sent
+        the pickled table with every chunk, and unpickles it once per worker process.
+        """
+        if is_array(values):
+            results = vector_select(self.cases, values, self._unhandled)
+            if results is UNSUPPORTED:
+                results = np.empty(len(values), dtype=object)
+                for i, result in enumerate(
+                    self.map(values.tolist(), executor=executor, chunksize=chunksize)
+                ):
+                    results[i] = result
+            return results
+
+        if executor is not None:
+            return self._map_in_executor(values, executor, chunksize)
+
+        dispatch = self._dispatch
+        return [dispatch(value) for value in values]
+
+    async def dispatch_async(self, value, *values):
+        """
+        dispatch value, awaitables returned by XObject or function patterns and by
+        actions are awaited
+        """
+        if values:
+            value = [value] + list(values)
+
+        found = await self._find_async(value)
+        if found is None:
+            return self._unhandled(value)
+        return await self._run_async(found)
+
+    async def amap(self, values, concurrency=16):
+        """
+        dispatch every value of an iterable or async iterable with `dispatch_async`,
+        at most `concurrency` values are dispatched at once, input order is kept
+        """
+        results = []
+        pending = deque()
+        try:
+            async for value in aiterate(values):
+                pending.append(asyncio.ensure_future(self.dispatch_async(value)))
+                if len(pending) >= concurrency:
+                    results.append(await pending.popleft())
+            while pending:
+                results.append(await pending.popleft())
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        return results
+
+    def process_pool(self, max_workers=None, **kwargs):
+        """
+        `ProcessPoolExecutor` whose workers unpickle the table once when they start,
+        `map` in it only sends the chunks of values
+        """
+        token, payload = self._pickled()
+        return TablePool(
+            token,
+            max_workers=max_workers,
+            initializer=install_table,
+            initargs=(token, payload),
+            **kwargs,
+        )
+
+    def _pickled(self):
+        # => (token, payload), tables are frozen so they are pickled once
+        if self._payload is None:
+            payload = pickle.dumps(self)
+            self._payload = hashlib.sha1(payload).hexdigest(), payload
+        return self._payload
+
+    def _map_in_executor(self, values, executor, chunksize):
+        if isinstance(executor, ProcessPoolExecutor):
+            token, payload = self._pickled()
+            if isinstance(executor, TablePool) and executor.token == token:
+                payload = None
+
+            def submit(chunk):
+                return executor.submit(map_chunk, token, payload, chunk)
+
+        else:
+
+            def submit(chunk):
+                return executor.submit(self.map, chunk)
+
+        # keep a bounded number of chunks in flight, so values can be streamed
+        window = 2 * (os.cpu_count() or 1)
+        results = []
+        pending = deque()
+        values = iter(values)
+        chunk = list(islice(values, chunksize))
+        while chunk:
+            pending.append(submit(chunk))
+            if len(pending) >= window:
+                results += pending.popleft().result()
+            chunk = list(islice(values, chunksize))
+        while pending:
+            results += pending.popleft().result()
+        return results
+
+    def stream(self, values, skip_unmatched=False, with_index=False):
+        """
+        dispatch values lazily, yields one result per value
+
+        With `skip_unmatched`, values matching no arm are dropped instead of being
+        handled by the default. With `with_index`, `(arm index, result)` is yielded,
+        arm index is None for unmatched values.
+        """
+        find = self._find
+        for value in values:
+            found = find(value)
+            if found is None:
+                if skip_unmatched:
+                    continue
+                position, result = None, self._unhandled(value)
+            else:
+                position, action, args = found
+                result = self._runners[position](action, args)
+            yield (position, result) if with_index else result
+
+    async def astream(self, values, skip_unmatched=False, with_index=False):
+        """
+        async `stream` of an iterable or async iterable with `dispatch_async`
+        """
+        async for value in aiterate(values):
+            found = await self._find_async(value)
+            if found is None:
+                if skip_unmatched:
+                    continue
+                position, result = None, self._unhandled(value)
+            else:
+                position, result = found[0], await self._run_async(found)
+            yield (position, result) if with_index else result
+
+    def _dispatch(self, value):
+        found = self._find(value)
+        if found is None:
+            return self._unhandled(value)
+        position, action, args = found
+        return self._runners[position](action, args)
+
+    def _find(self, value):
+        """
+        find the first matching arm, returns `(position, action, args)` or None
+        """
+        if (self._native is not None or self._native_index is not None) and (
+            not self._sequences
+            or value.__class__ in (list, tuple)
+            or not isinstance(value, Iterable)
+        ):
+            # other iterables are matched as sequences by the compiled matchers only
+            if self._native_index is None:
+                found = self._native(value)
+            else:
+                found = self._native_index.select(value)(value)
+            if found is None:
+                return None
+            position, args = found
+            return position, self._arms[position][1], args if args else boxed(value)
+
+        graph = self._graph
+        memo = None if graph is None else {XGraph.ROOT: value}
+        subject = self._lazy_subject(value)
+        arms = self._arms if self._index is None else self._index.select(value)
+        for match, action, node, position in arms:
+            current = value if subject is None else subject(position)
+            if node is None:
+                matched_as_value, args = match(current)
+            elif subject is not None:
+                # the shared nodes would all read the same iterator
+                matched_as_value, args = match(
+                    self.cases[position].pattern._x_func(current)
+                )
+            else:
+                matched_as_value, args = match(graph.result(node, value, memo))
+            if matched_as_value:
+                if subject is not None:
+                    current, args = subject.restore(position, current, args)
+                return position, action, args if args else boxed(current)
+        return None
+
+    def _lazy_subject(self, value):
+        """
+        iterators are shared by the arms of a dispatch through a `Replay`,
+        returns the `IteratorSubject` of an iterator value, None for other values
+        """
+        if not self._sequences or not isinstance(value, Iterator):
+            return None
+        return IteratorSubject(value, self._sequences, self._instances)
+
+    async def _find_async(self, value):
+        if self._async_dispatch is None:
+            arms = tuple(
+                (
+                    match
+                    if node is not None
+                    else compile_async_pattern(case.pattern, self.views),
+                    action,
+                    node,
+                    position,
+                )
+                for case, (match, action, node, position) in zip(self.cases, self._arms)
+            )
+            index = None if self._index is None else DispatchIndex(self._keys, arms)
+            self._async_dispatch = arms, index
+
+        arms, index = self._async_dispatch
+        graph = self._graph
+        memo = None if graph is None else {XGraph.ROOT: value}
+        subject = self._lazy_subject(value)
+        for match, action, node, position in (
+            arms if index is None else index.select(value)
+        ):
+            current = value if subject is None else subject(position)
+            if node is None:
+                matched_as_value, args = await match(current)
+            elif subject is not None:
+                # the shared nodes would all read the same iterator
+                return_value = self.cases[position].pattern._x_func(current)
+                if isawaitable(return_value):
+                    return_value = await return_value
+                matched_as_value, args = match(return_value)
+            else:
+                return_value = graph.result(node, value, memo)
+                if isawaitable(return_value):
+                    # awaitables can only be awaited once, share the result instead
+                    return_value = memo[node] = await return_value
+                matched_as_value, args = match(return_value)
+            if matched_as_value:
+                if subject is not None:
+                    current, args = subject.restore(position, current, args)
+                return position, action, args if args else boxed(current)
+        return None
+
+    async def _run_async(self, found):
+        position, action, args = found
+        result = self._runners[position](action, args)
+        if isawaitable(result):
+            result = await result
+        return result
+
+    def _unhandled(self, value):
+        if self._default is not NoDefault:
+            return self._default
+        if not self._handles_all:
+            raise MatchError(
+                "'_' not provided. This case is not handled:\n%s" % str(value)
+            )
+
+
+class IteratorSubject(object):
+    """
+    what the arms of a dispatch read of an iterator
+
+    Sequence arms read the items buffered by a shared `Replay`, type arms read the
+    iterator itself since they only check its class, the other arms read a replay
+    of the buffered items followed by the rest of the iterator.
+    """
+
+    def __init__(self, iterator, sequences, instances):
+        self.iterator = iterator
+        self.replay = Replay(iterator)
+        self.sequences = sequences
+        self.instances = instances
+
+    def __call__(self, position):
+        if position in self.sequences:
+            return self.replay
+        elif position in self.instances:
+            return self.iterator
+        return self.replay.replay()
+
+    def restore(self, position, current, args):
+        """
+        the value read by a matched arm other than a sequence one is replaced by a
+        new replay, as type arms and guards may have read it, returns `(current, args)`
+        """
+        if position in self.sequences:
+            return current, args
+        replay = self.replay.replay()
+        if replay is current:
+            return current, args
+        return replay, [replay if arg is current else arg for arg in args]
+
+
+class acaseof(caseof):
+    """
+    async caseof, `await (acaseof(v) | ...)` awaits the matched action,
+    `~(acaseof(X) | ...)` returns the `dispatch_async` of a compiled table
+    """
+
+    def __invert__(self):
+        table = self._table()
+        if isinstance(self.value, XObject):
+            return table.dispatch_async
+        return table.dispatch_async(self.value)
+
+    def __await__(self):
+        return (~self).__await__()
+
+
+async def aiterate(values):
+    if hasattr(values, "__aiter__"):
+        async for value in values:
+            yield value
+    else:
+        for value in values:
+            yield value
+
+
+class TablePool(ProcessPoolExecutor):
+    """
+    process pool of `Matchtable.process_pool`, `token` identifies its table
+    """
+
+    def __init__(self, token, *args, **kwargs):
+        super(TablePool, self).__init__(*args, **kwargs)
+        self.token = token
+
+
+# tables unpickled in the current worker process, by payload digest
+worker_tables = OrderedDict()
+
+# tables installed when the current worker process started, never evicted
+installed_tables = {}
+
+
+def install_table(token, payload):
+    installed_tables[token] = pickle.loads(payload)
+
+
+def map_chunk(token, payload, chunk):
+    table = installed_tables.get(token)
+    if table is None:
+        table = worker_tables.get(token)
+    if table is None:
+        table = worker_tables[token] = pickle.loads(payload)
+        if len(worker_tables) > 16:
+            worker_tables.popitem(last=False)
+    return table.map(chunk)